@@ -0,0 +1,168 @@
+"""
+Поколения кэша и защита от одновременного пересчёта ключей.
+
+Ключи фрагментов включают номер поколения пространства имён,
+поэтому для сброса всех фрагментов достаточно увеличить номер:
+старые ключи больше не запрашиваются и истекают сами.
+
+Реплика может отставать, и страница, прочитанная с неё сразу после
+записи, попала бы в кэш под новым поколением и жила бы там до
+истечения. Поэтому первые REPLICA_PIN_SECONDS после сброса поколения
+значения, посчитанные по реплике, в кэш не пишутся.
+"""
+import math
+import random
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.utils import make_template_fragment_key
+
+from core.db_routers import reading_from_replica
+
+# Время последнего сброса любого поколения.
+BUMPED_KEY = 'generation:bumped'
+
+
+def generation_key(namespace):
+    return f'generation:{namespace}'
+
+
+def modified_key(namespace):
+    return f'generation:{namespace}:modified'
+
+
+def get_generation(namespace):
+    """Текущее поколение пространства имён."""
+    key = generation_key(namespace)
+    generation = cache.get(key)
+    if generation is None:
+        # Начинаем с метки времени, чтобы после очистки кэша
+        # не выдать заново номера, под которыми уже лежат фрагменты.
+        cache.add(key, int(time.time() * 1000), None)
+        generation = cache.get(key)
+    return generation
+
+
+def get_last_modified(namespace):
+    """
+    Время последнего изменения данных пространства имён (unix time).
+    Если кэш пуст, отсчёт начинается с текущего момента.
+    """
+    key = modified_key(namespace)
+    modified = cache.get(key)
+    if modified is None:
+        cache.add(key, int(time.time()), None)
+        modified = cache.get(key)
+    return modified
+
+
+def bump_generation(namespace, modified=None):
+    """
+    Переводит пространство имён на новое поколение.
+    modified - время изменения данных, по умолчанию текущее.
+    """
+    modified = modified.timestamp() if modified else time.time()
+    cache.set(modified_key(namespace), int(modified), None)
+    cache.set(BUMPED_KEY, time.time(), None)
+    try:
+        return cache.incr(generation_key(namespace))
+    except ValueError:
+        return get_generation(namespace)
+
+
+def replica_may_lag():
+    """
+    Читает ли запрос с реплики, которая могла ещё не получить последние
+    изменения. Такой результат нельзя класть в кэш.
+    """
+    if not reading_from_replica():
+        return False
+    bumped = cache.get(BUMPED_KEY) or 0
+    return time.time() - bumped < settings.REPLICA_PIN_SECONDS
+
+
+def drop_fragment(fragment_name, *vary_on, using='local'):
+    """Сбрасывает фрагмент шаблона во всех процессах."""
+    caches[using].delete(make_template_fragment_key(fragment_name, vary_on))
+
+
+def get_or_recompute(key, compute, timeout, using=cache, beta=1.0,
+                     cacheable=None):
+    """
+    Возвращает значение ключа, пересчитывая его не более чем в одном
+    воркере одновременно.
+
+    Значение хранится вместе со временем пересчёта и логическим сроком
+    жизни, а физически живёт ещё CACHE_STALE_TIMEOUT секунд. Незадолго
+    до срока ключ с вероятностью, растущей по мере приближения к нему,
+    пересчитывается заранее (XFetch, чем дольше пересчёт и больше beta,
+    тем раньше). Пересчитывает только воркер, взявший блокировку,
+    остальные отдают устаревшее значение. Если значения нет вовсе,
+    остальные ждут до CACHE_LOCK_TIMEOUT секунд, пока его посчитают.
+    cacheable(value) может запретить сохранение результата.
+
+    Блокировка хранит случайный токен, и снимает её только тот, кто её
+    взял. Если держатель блокировки упал или результат не сохранился,
+    ожидающие не досиживают таймаут: как только блокировка снята,
+    следующий из них берёт её и считает сам.
+    """
+    lock = f'{key}:lock'
+    token = uuid.uuid4().hex
+    entry = using.get(key)
+    if entry is not None:
+        value, delta, expires = entry
+        early = delta * beta * math.log(1.0 - random.random())
+        if expires is None or time.time() - early < expires:
+            return value
+        if not using.add(lock, token, settings.CACHE_LOCK_TIMEOUT):
+            return value
+        locked = True
+    else:
+        entry, locked = _wait_for(key, lock, token, using)
+        if entry is not None:
+            return entry[0]
+    try:
+        started = time.time()
+        value = compute()
+        finished = time.time()
+        if ((cacheable is None or cacheable(value))
+                and not replica_may_lag()):
+            expires = None if timeout is None else finished + timeout
+            using.set(key, (value, finished - started, expires),
+                      None if timeout is None
+                      else timeout + settings.CACHE_STALE_TIMEOUT)
+    finally:
+        if locked:
+            _release(lock, token, using)
+    return value
+
+
+def _wait_for(key, lock, token, using):
+    """
+    Ждёт, пока другой воркер посчитает значение. Возвращает
+    (значение или None, взята ли блокировка). Без блокировки после
+    CACHE_LOCK_TIMEOUT значение считается без неё.
+    """
+    deadline = time.time() + settings.CACHE_LOCK_TIMEOUT
+    while True:
+        if using.add(lock, token, settings.CACHE_LOCK_TIMEOUT):
+            entry = using.get(key)
+            if entry is not None:
+                # Значение сохранили прямо перед снятием блокировки.
+                _release(lock, token, using)
+                return entry, False
+            return None, True
+        entry = using.get(key)
+        if entry is not None:
+            return entry, False
+        if time.time() >= deadline:
+            return None, False
+        time.sleep(0.05)
+
+
+def _release(lock, token, using):
+    """Снимает блокировку, только если она всё ещё наша."""
+    if using.get(lock) == token:
+        using.delete(lock)
@@ -0,0 +1,249 @@
+"""
+Кэш в файле SQLite в режиме WAL.
+
+В отличие от LocMemCache один файл разделяют все процессы
+на хосте: попадания в кэш не падают с ростом числа воркеров,
+а очистка и сброс ключей видны всем процессам сразу.
+Старые записи вытесняются по LRU при превышении MAX_ENTRIES
+или MAX_SIZE (в байтах).
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = (
+    '''CREATE TABLE IF NOT EXISTS cache (
+        key TEXT PRIMARY KEY,
+        value BLOB NOT NULL,
+        expires REAL,
+        accessed REAL NOT NULL,
+        size INTEGER NOT NULL
+    )''',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+    'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)',
+    '''CREATE TABLE IF NOT EXISTS cache_stats (
+        id INTEGER PRIMARY KEY CHECK (id = 0),
+        entries INTEGER NOT NULL,
+        bytes INTEGER NOT NULL
+    )''',
+    'INSERT OR IGNORE INTO cache_stats VALUES (0, 0, 0)',
+    '''CREATE TRIGGER IF NOT EXISTS cache_insert AFTER INSERT ON cache
+    BEGIN
+        UPDATE cache_stats
+        SET entries = entries + 1, bytes = bytes + NEW.size;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS cache_delete AFTER DELETE ON cache
+    BEGIN
+        UPDATE cache_stats
+        SET entries = entries - 1, bytes = bytes - OLD.size;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS cache_update AFTER UPDATE OF size ON cache
+    BEGIN
+        UPDATE cache_stats SET bytes = bytes + NEW.size - OLD.size;
+    END''',
+)
+
+UPSERT = '''
+    INSERT INTO cache (key, value, expires, accessed, size)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (key) DO UPDATE SET
+        value = excluded.value,
+        expires = excluded.expires,
+        accessed = excluded.accessed,
+        size = excluded.size
+'''
+
+
+class _ImmediateTransaction:
+    """
+    BEGIN IMMEDIATE сразу берёт блокировку на запись, поэтому
+    чтение и запись внутри транзакции не перемежаются с другими
+    процессами, а ожидание блокировки ограничено busy_timeout.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute('BEGIN IMMEDIATE')
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.connection.execute('ROLLBACK' if exc_type else 'COMMIT')
+
+
+class SQLiteCache(BaseCache):
+    """Общий для всех процессов кэш в SQLite с LRU-вытеснением."""
+
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = os.path.abspath(location)
+        self._max_size = int(options.get('MAX_SIZE', 64 * 1024 * 1024))
+        self._busy_timeout = float(options.get('BUSY_TIMEOUT', 5))
+        # Время последнего обращения обновляется не чаще раза
+        # в TOUCH_INTERVAL секунд, чтобы чтение не превращалось в запись.
+        self._touch_interval = float(options.get('TOUCH_INTERVAL', 1))
+        self._local = threading.local()
+
+    def _connect(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(self._path), exist_ok=True)
+            connection = sqlite3.connect(
+                self._path,
+                timeout=self._busy_timeout,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            with _ImmediateTransaction(connection):
+                for statement in SCHEMA:
+                    connection.execute(statement)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _dumps(self, value):
+        return pickle.dumps(value, self.pickle_protocol)
+
+    def _fetch(self, connection, key, now):
+        row = connection.execute(
+            'SELECT value, expires, accessed FROM cache WHERE key = ?',
+            (key,),
+        ).fetchone()
+        if row is None:
+            return None
+        value, expires, accessed = row
+        if expires is not None and expires <= now:
+            connection.execute(
+                'DELETE FROM cache WHERE key = ? AND expires <= ?',
+                (key, now))
+            return None
+        if now - accessed > self._touch_interval:
+            connection.execute(
+                'UPDATE cache SET accessed = ? WHERE key = ?', (now, key))
+        return value
+
+    def _store(self, connection, key, value, timeout, now):
+        blob = self._dumps(value)
+        self._cull(connection, len(blob), now)
+        connection.execute(UPSERT, (
+            key, blob, self.get_backend_timeout(timeout), now, len(blob)))
+
+    def _cull(self, connection, incoming, now):
+        entries, size = connection.execute(
+            'SELECT entries, bytes FROM cache_stats').fetchone()
+        if (entries < self._max_entries
+                and size + incoming <= self._max_size):
+            return
+        connection.execute(
+            'DELETE FROM cache WHERE expires <= ?', (now,))
+        if self._cull_frequency == 0:
+            connection.execute('DELETE FROM cache')
+            return
+        entries, size = connection.execute(
+            'SELECT entries, bytes FROM cache_stats').fetchone()
+        while entries and (entries >= self._max_entries
+                           or size + incoming > self._max_size):
+            connection.execute(
+                '''DELETE FROM cache WHERE key IN (
+                    SELECT key FROM cache ORDER BY accessed LIMIT ?
+                )''',
+                (max(1, entries // self._cull_frequency),))
+            entries, size = connection.execute(
+                'SELECT entries, bytes FROM cache_stats').fetchone()
+
+    def get(self, key, default=None, version=None):
+        value = self._fetch(self._connect(), self._key(key, version),
+                            time.time())
+        if value is None:
+            return default
+        return pickle.loads(value)
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        if not keys:
+            return {}
+        now = time.time()
+        rows = self._connect().execute(
+            'SELECT key, value FROM cache WHERE key IN (%s) '
+            'AND (expires IS NULL OR expires > ?)'
+            % ', '.join('?' * len(keys)),
+            (*keys, now),
+        ).fetchall()
+        return {keys[key]: pickle.loads(value) for key, value in rows}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        connection = self._connect()
+        with _ImmediateTransaction(connection):
+            self._store(connection, key, value, timeout, time.time())
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        connection = self._connect()
+        with _ImmediateTransaction(connection):
+            now = time.time()
+            if self._fetch(connection, key, now) is not None:
+                return False
+            self._store(connection, key, value, timeout, now)
+            return True
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        cursor = self._connect().execute(
+            'UPDATE cache SET expires = ? WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), self._key(key, version),
+             time.time()),
+        )
+        return cursor.rowcount > 0
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        connection = self._connect()
+        with _ImmediateTransaction(connection):
+            now = time.time()
+            blob = self._fetch(connection, key, now)
+            if blob is None:
+                raise ValueError("Key '%s' not found" % key)
+            value = pickle.loads(blob) + delta
+            blob = self._dumps(value)
+            connection.execute(
+                'UPDATE cache SET value = ?, size = ? WHERE key = ?',
+                (blob, len(blob), key))
+            return value
+
+    def delete(self, key, version=None):
+        cursor = self._connect().execute(
+            'DELETE FROM cache WHERE key = ?', (self._key(key, version),))
+        return cursor.rowcount > 0
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        if keys:
+            self._connect().execute(
+                'DELETE FROM cache WHERE key IN (%s)'
+                % ', '.join('?' * len(keys)), keys)
+
+    def has_key(self, key, version=None):
+        row = self._connect().execute(
+            'SELECT 1 FROM cache WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (self._key(key, version), time.time()),
+        ).fetchone()
+        return row is not None
+
+    def clear(self):
+        self._connect().execute('DELETE FROM cache')
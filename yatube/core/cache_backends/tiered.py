@@ -0,0 +1,172 @@
+"""
+Двухуровневый кэш: небольшой LRU в памяти процесса перед общим кэшем.
+
+LOCATION - имя общего кэша из CACHES. Чтение сначала идёт в память
+процесса, при промахе - в общий кэш. Каждая запись и удаление
+публикуются в общий кэш как сообщения об инвалидации с порядковым
+номером, остальные процессы не реже POLL_INTERVAL секунд забирают новые
+сообщения и выбрасывают устаревшие ключи из своей памяти. Если сообщения
+потеряны (истекли или их слишком много), память процесса очищается
+целиком. L1_TIMEOUT ограничивает, сколько запись живёт в памяти процесса.
+"""
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SEQUENCE_KEY = 'tiered:invalidation'
+CLEAR_ALL = '*'
+
+
+class TieredCache(BaseCache):
+    """LRU в памяти процесса перед общим кэшем с рассылкой инвалидаций."""
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = location
+        self._l1_timeout = float(options.get('L1_TIMEOUT', 30))
+        self._poll_interval = float(options.get('POLL_INTERVAL', 1))
+        self._message_timeout = int(options.get('MESSAGE_TIMEOUT', 300))
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+        self._seen = None
+        self._next_poll = 0.0
+        self._stats = defaultdict(lambda: {
+            'l1_hits': 0, 'l2_hits': 0, 'misses': 0})
+
+    @property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    @staticmethod
+    def namespace(key):
+        """Фрагменты шаблонов группируются по имени, прочее - по префиксу."""
+        if key.startswith('template.cache.'):
+            return key.split('.')[2]
+        return key.split(':', 1)[0]
+
+    def stats(self):
+        """Попадания в L1, в общий кэш и промахи по пространствам имён."""
+        with self._lock:
+            return {namespace: dict(counters)
+                    for namespace, counters in self._stats.items()}
+
+    def _count(self, key, outcome):
+        with self._lock:
+            self._stats[self.namespace(key)][outcome] += 1
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.time() + self._l1_timeout)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def _forget(self, keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def _publish(self, keys):
+        self._forget(keys)
+        shared = self.shared
+        shared.add(SEQUENCE_KEY, 0, None)
+        try:
+            sequence = shared.incr(SEQUENCE_KEY)
+        except ValueError:
+            return
+        shared.set(f'{SEQUENCE_KEY}:{sequence}', list(keys),
+                   self._message_timeout)
+
+    def _poll(self):
+        now = time.time()
+        if now < self._next_poll:
+            return
+        self._next_poll = now + self._poll_interval
+        current = self.shared.get(SEQUENCE_KEY)
+        if current is None:
+            # Общий кэш очищен или ключ вытеснен: сообщения потеряны.
+            self._clear_local()
+            self.shared.add(SEQUENCE_KEY, 0, None)
+            self._seen = self.shared.get(SEQUENCE_KEY)
+            return
+        seen, self._seen = self._seen, current
+        if seen is None or current == seen:
+            return
+        if current < seen or current - seen > self._max_entries:
+            self._clear_local()
+            return
+        names = [f'{SEQUENCE_KEY}:{number}'
+                 for number in range(seen + 1, current + 1)]
+        messages = self.shared.get_many(names)
+        if len(messages) < len(names):
+            self._clear_local()
+            return
+        for keys in messages.values():
+            if CLEAR_ALL in keys:
+                self._clear_local()
+                return
+            self._forget(keys)
+
+    def _clear_local(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _local_key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def get(self, key, default=None, version=None):
+        local_key = self._local_key(key, version)
+        self._poll()
+        with self._lock:
+            entry = self._entries.get(local_key)
+            if entry is not None and entry[1] > time.time():
+                self._entries.move_to_end(local_key)
+                self._count(key, 'l1_hits')
+                return entry[0]
+        value = self.shared.get(key, version=version)
+        if value is None:
+            self._count(key, 'misses')
+            return default
+        self._count(key, 'l2_hits')
+        self._remember(local_key, value)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version=version)
+        self._publish([self._local_key(key, version)])
+        self._remember(self._local_key(key, version), value)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.add(key, value, timeout, version=version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, timeout, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        value = self.shared.incr(key, delta, version=version)
+        self._publish([self._local_key(key, version)])
+        return value
+
+    def delete(self, key, version=None):
+        result = self.shared.delete(key, version=version)
+        self._publish([self._local_key(key, version)])
+        return result
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        self.shared.delete_many(keys, version=version)
+        self._publish([self._local_key(key, version) for key in keys])
+
+    def has_key(self, key, version=None):
+        return self.get(key, version=version) is not None
+
+    def clear(self):
+        self.shared.clear()
+        self._clear_local()
+        self._publish([CLEAR_ALL])
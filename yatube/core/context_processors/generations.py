@@ -0,0 +1,24 @@
+from django.conf import settings
+
+from core.cache import get_generation
+
+
+class Generations:
+    """Поколения кэша, запрашиваемые из шаблона по имени."""
+
+    def __init__(self):
+        self._seen = {}
+
+    def __getitem__(self, namespace):
+        if namespace not in self._seen:
+            self._seen[namespace] = get_generation(namespace)
+        return self._seen[namespace]
+
+
+def generations(request):
+    """Добавляет поколения кэша и время жизни кэшированных фрагментов."""
+    return {
+        'generations': Generations(),
+        'page_cache_timeout': settings.PAGE_CACHE_TIMEOUT,
+        'card_cache_timeout': settings.POST_CARD_CACHE_TIMEOUT,
+    }
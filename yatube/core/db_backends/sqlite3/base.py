@@ -0,0 +1,15 @@
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    SQLite, где atomic() начинает транзакцию с BEGIN IMMEDIATE.
+
+    Обычный BEGIN берёт блокировку на запись только на первой записи.
+    Если к этому моменту другой процесс уже что-то записал, SQLite сразу
+    возвращает "database is locked", не дожидаясь busy_timeout.
+    BEGIN IMMEDIATE ждёт блокировку в начале транзакции.
+    """
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE')
@@ -0,0 +1,75 @@
+"""
+Чтение с реплики для GET-запросов.
+
+ReplicaRouter отправляет чтение на базу REPLICA, только если
+ReplicaMiddleware разрешила это для текущего запроса: метод безопасный,
+view из приложения REPLICA_APPS, а у пользователя нет свежей записи.
+Все записи, сессии и любые запросы вне HTTP (команды, миграции, shell)
+идут в основную базу. После первой записи в запросе чтение до его конца
+тоже идёт в основную базу.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import DEFAULT_DB_ALIAS
+
+REPLICA = 'replica'
+
+_state = ContextVar('replica_state', default=None)
+
+
+class RequestState:
+    __slots__ = ('replica', 'wrote')
+
+    def __init__(self):
+        self.replica = False
+        self.wrote = False
+
+
+@contextmanager
+def request_state():
+    """Состояние маршрутизации на время одного запроса."""
+    state = RequestState()
+    token = _state.set(state)
+    try:
+        yield state
+    finally:
+        _state.reset(token)
+
+
+def read_from_replica():
+    """Разрешает текущему запросу читать с реплики."""
+    state = _state.get()
+    if state is not None:
+        state.replica = True
+
+
+def reading_from_replica():
+    """Читает ли текущий запрос с реплики."""
+    state = _state.get()
+    return state is not None and state.replica and not state.wrote
+
+
+class ReplicaRouter:
+    # Сессии читаются из основной базы: только что выданная сессия
+    # могла ещё не доехать до реплики.
+    primary_apps = ('sessions',)
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if (state is not None and state.replica and not state.wrote
+                and model._meta.app_label not in self.primary_apps):
+            return REPLICA
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,81 @@
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                patch_vary_headers)
+from django.utils.http import http_date, quote_etag, urlencode
+
+from core.cache import get_generation, get_last_modified, get_or_recompute
+
+# Параметры запроса, которые читают view с кэшем страниц. Запросы
+# с другими параметрами не кэшируются: иначе каждый новый параметр
+# рендерил бы страницу заново и занимал место в общем кэше.
+PAGE_CACHE_PARAMS = ('page', 'cursor', 'q')
+
+
+def anonymous_page_cache(*namespaces):
+    """
+    Кэширует страницу целиком для неавторизованных GET-запросов.
+
+    Ключ и сильный ETag строятся из пути, параметров PAGE_CACHE_PARAMS
+    и поколений namespaces, Last-Modified - из времени последнего
+    изменения данных этих пространств имён. Повторный запрос
+    с If-None-Match или If-Modified-Since получает 304 без рендера
+    шаблона и без запросов к базе, если у посетителя нет сессии.
+    Пространство имён может быть функцией от аргументов view:
+    namespace(request, *args, **kwargs).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (request.method not in ('GET', 'HEAD')
+                    or request.user.is_authenticated
+                    or set(request.GET) - set(PAGE_CACHE_PARAMS)):
+                return view(request, *args, **kwargs)
+            names = [name(request, *args, **kwargs) if callable(name)
+                     else name for name in namespaces]
+            generations = [get_generation(name) for name in names]
+            digest = hashlib.md5(
+                f'{request.path}?{_cached_params(request)}:{generations}'
+                .encode()
+            ).hexdigest()
+            etag = quote_etag(digest)
+            last_modified = max(get_last_modified(name) for name in names)
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = get_or_recompute(
+                    f'page:{digest}',
+                    lambda: view(request, *args, **kwargs),
+                    settings.PAGE_CACHE_TIMEOUT,
+                    cacheable=_is_cacheable,
+                )
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+            patch_cache_control(response, no_cache=True)
+            patch_vary_headers(response, ('Cookie',))
+            return response
+        return wrapper
+    return decorator
+
+
+def _cached_params(request):
+    """Параметры из PAGE_CACHE_PARAMS в постоянном порядке."""
+    return urlencode([(name, value) for name in PAGE_CACHE_PARAMS
+                      for value in request.GET.getlist(name)])
+
+
+def _is_cacheable(response):
+    return response.status_code == 200 and not response.cookies
+
+
+def query_budget(queries):
+    """
+    Объявляет, сколько SQL-запросов может сделать view.
+    Проверяет бюджет QueryBudgetMiddleware.
+    """
+    def decorator(view):
+        view.query_budget = queries
+        return view
+    return decorator
@@ -0,0 +1,78 @@
+import multiprocessing
+import random
+import shutil
+import tempfile
+import time
+
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+
+from core.cache_backends.sqlite import SQLiteCache
+
+BACKENDS = {
+    'locmem': lambda location: LocMemCache(
+        'benchmark', {'OPTIONS': {'MAX_ENTRIES': 100_000}}),
+    'filebased': lambda location: FileBasedCache(
+        location, {'OPTIONS': {'MAX_ENTRIES': 100_000}}),
+    'sqlite': lambda location: SQLiteCache(
+        f'{location}/cache.sqlite3', {'OPTIONS': {'MAX_ENTRIES': 100_000}}),
+}
+
+
+def run_worker(args):
+    """Смешанная нагрузка get/set одного процесса."""
+    backend, location, operations, keys, read_ratio, value = args
+    cache = BACKENDS[backend](location)
+    rnd = random.Random()
+    hits = gets = 0
+    started = time.perf_counter()
+    for _ in range(operations):
+        key = f'key:{rnd.randrange(keys)}'
+        if rnd.random() < read_ratio:
+            gets += 1
+            hits += cache.get(key) is not None
+        else:
+            cache.set(key, value)
+    return time.perf_counter() - started, hits, gets
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает пропускную способность get/set кэшей '
+            'LocMemCache, FileBasedCache и SQLiteCache '
+            'при одновременной работе нескольких процессов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=4)
+        parser.add_argument('--operations', type=int, default=5000,
+                            help='Операций на процесс.')
+        parser.add_argument('--keys', type=int, default=1000)
+        parser.add_argument('--read-ratio', type=float, default=0.9)
+        parser.add_argument('--value-size', type=int, default=2048)
+        parser.add_argument('--backend', action='append',
+                            choices=sorted(BACKENDS),
+                            help='По умолчанию проверяются все.')
+
+    def handle(self, *args, **options):
+        value = 'x' * options['value_size']
+        processes = options['processes']
+        self.stdout.write(
+            f'{"backend":<10} {"ops/s":>10} {"hit ratio":>10}')
+        for backend in options['backend'] or sorted(BACKENDS):
+            location = tempfile.mkdtemp()
+            try:
+                jobs = [(backend, location, options['operations'],
+                         options['keys'], options['read_ratio'], value)
+                        ] * processes
+                started = time.perf_counter()
+                with multiprocessing.Pool(processes) as pool:
+                    results = pool.map(run_worker, jobs)
+                elapsed = time.perf_counter() - started
+            finally:
+                shutil.rmtree(location, ignore_errors=True)
+            total = options['operations'] * processes
+            hits = sum(result[1] for result in results)
+            gets = sum(result[2] for result in results) or 1
+            self.stdout.write(
+                f'{backend:<10} {total / elapsed:>10.0f} '
+                f'{hits / gets:>10.2%}')
@@ -0,0 +1,133 @@
+import multiprocessing
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+SCHEMA = (
+    '''CREATE TABLE post (
+        id INTEGER PRIMARY KEY,
+        text TEXT NOT NULL,
+        comment_count INTEGER NOT NULL DEFAULT 0
+    )''',
+    '''CREATE TABLE comment (
+        id INTEGER PRIMARY KEY,
+        post_id INTEGER NOT NULL REFERENCES post (id),
+        text TEXT NOT NULL
+    )''',
+    'CREATE INDEX comment_post ON comment (post_id)',
+)
+
+# Прагмы соединения и команда начала транзакции.
+PROFILES = {
+    # Настройки sqlite3 по умолчанию, с которыми работает Django.
+    'stock': ((), 'BEGIN'),
+    # SQLITE_PRAGMAS и core.db_backends.sqlite3.
+    'tuned': (settings.SQLITE_PRAGMAS, 'BEGIN IMMEDIATE'),
+}
+
+
+def connect(path, profile):
+    connection = sqlite3.connect(path, isolation_level=None)
+    for pragma in PROFILES[profile][0]:
+        connection.execute(f'PRAGMA {pragma}')
+    return connection
+
+
+def prepare(path, profile, posts):
+    connection = connect(path, profile)
+    for statement in SCHEMA:
+        connection.execute(statement)
+    connection.executemany(
+        'INSERT INTO post (text) VALUES (?)',
+        (('x' * 500,) for _ in range(posts)))
+    connection.close()
+
+
+def run_worker(args):
+    """
+    Смешанная нагрузка одного процесса: чтение страницы комментариев
+    и добавление комментария со счётчиком в транзакции, как в atomic().
+    """
+    path, profile, operations, posts, write_ratio = args
+    connection = connect(path, profile)
+    begin = PROFILES[profile][1]
+    rnd = random.Random()
+    reads = writes = locked = 0
+    started = time.perf_counter()
+    for _ in range(operations):
+        post_id = rnd.randrange(1, posts + 1)
+        try:
+            if rnd.random() < write_ratio:
+                connection.execute(begin)
+                try:
+                    connection.execute(
+                        'SELECT id FROM post WHERE id = ?', (post_id,))
+                    connection.execute(
+                        'INSERT INTO comment (post_id, text) VALUES (?, ?)',
+                        (post_id, 'комментарий'))
+                    connection.execute(
+                        'UPDATE post SET comment_count = comment_count + 1 '
+                        'WHERE id = ?', (post_id,))
+                    connection.execute('COMMIT')
+                except sqlite3.OperationalError:
+                    connection.execute('ROLLBACK')
+                    raise
+                writes += 1
+            else:
+                connection.execute(
+                    'SELECT p.text, c.text FROM post p '
+                    'LEFT JOIN comment c ON c.post_id = p.id '
+                    'WHERE p.id = ? ORDER BY c.id DESC LIMIT 10',
+                    (post_id,)).fetchall()
+                reads += 1
+        except sqlite3.OperationalError:
+            locked += 1
+    return time.perf_counter() - started, reads, writes, locked
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает пропускную способность чтения и записи SQLite '
+            'с настройками по умолчанию и с SQLITE_PRAGMAS '
+            'при одновременной работе нескольких процессов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=4)
+        parser.add_argument('--operations', type=int, default=2000,
+                            help='Операций на процесс.')
+        parser.add_argument('--posts', type=int, default=1000)
+        parser.add_argument('--write-ratio', type=float, default=0.2)
+        parser.add_argument('--profile', action='append',
+                            choices=sorted(PROFILES),
+                            help='По умолчанию проверяются все.')
+
+    def handle(self, *args, **options):
+        processes = options['processes']
+        self.stdout.write(
+            f'{"profile":<8} {"reads/s":>10} {"writes/s":>10} '
+            f'{"locked":>8}')
+        for profile in options['profile'] or sorted(PROFILES):
+            location = tempfile.mkdtemp()
+            path = os.path.join(location, 'benchmark.sqlite3')
+            try:
+                prepare(path, profile, options['posts'])
+                jobs = [(path, profile, options['operations'],
+                         options['posts'], options['write_ratio'])
+                        ] * processes
+                started = time.perf_counter()
+                with multiprocessing.Pool(processes) as pool:
+                    results = pool.map(run_worker, jobs)
+                elapsed = time.perf_counter() - started
+            finally:
+                shutil.rmtree(location, ignore_errors=True)
+            reads = sum(result[1] for result in results)
+            writes = sum(result[2] for result in results)
+            locked = sum(result[3] for result in results)
+            self.stdout.write(
+                f'{profile:<8} {reads / elapsed:>10.0f} '
+                f'{writes / elapsed:>10.0f} {locked:>8}')
@@ -0,0 +1,44 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from core.db_routers import REPLICA
+
+
+class Command(BaseCommand):
+    help = ('Копирует основную базу SQLite в файл реплики '
+            'через backup API, не останавливая запись в основную.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float,
+                            help='Повторять копирование каждые N секунд.')
+
+    def handle(self, *args, **options):
+        primary = settings.DATABASES[DEFAULT_DB_ALIAS]
+        replica = settings.DATABASES.get(REPLICA)
+        if replica is None:
+            raise CommandError(f'В DATABASES нет базы {REPLICA!r}.')
+        for alias in (DEFAULT_DB_ALIAS, REPLICA):
+            if connections[alias].vendor != 'sqlite':
+                raise CommandError('sync_replica работает только с SQLite.')
+        while True:
+            started = time.perf_counter()
+            self.sync(primary['NAME'], replica['NAME'])
+            self.stdout.write(
+                f'Реплика обновлена за '
+                f'{(time.perf_counter() - started) * 1000:.0f} мс')
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
+
+    def sync(self, source_path, target_path):
+        source = sqlite3.connect(source_path)
+        target = sqlite3.connect(target_path)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
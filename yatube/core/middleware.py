@@ -0,0 +1,136 @@
+"""
+Учёт SQL-запросов и выбор базы на запрос пользователя.
+
+QueryBudgetMiddleware включается настройкой QUERY_BUDGET_ENABLED.
+Она считает запросы ко всем базам и время их выполнения, сравнивает
+количество с бюджетом, объявленным у view декоратором query_budget,
+и ищет N+1: один и тот же по форме запрос, повторённый больше
+QUERY_BUDGET_REPEAT_LIMIT раз. Запросы к таблицам из
+QUERY_BUDGET_IGNORE_TABLES не учитываются. Нарушения пишутся в лог
+yatube.queries с именем view, а при QUERY_BUDGET_RAISE поднимается
+QueryBudgetExceeded.
+
+ReplicaMiddleware включается настройкой USE_REPLICA и разрешает
+GET-запросам к view из REPLICA_APPS читать с реплики. Пользователь,
+который только что что-то записал, получает cookie REPLICA_PIN_COOKIE
+на REPLICA_PIN_SECONDS секунд и до её истечения читает из основной
+базы, поэтому сразу видит свои изменения.
+"""
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from core import db_routers
+
+logger = logging.getLogger('yatube.queries')
+
+PLACEHOLDERS = re.compile(r'%s(, %s)+')
+# Служебные команды транзакций - не запросы к данным.
+SAVEPOINTS = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT')
+
+
+class QueryBudgetExceeded(Exception):
+    """View сделала больше запросов, чем разрешено, или попала в N+1."""
+
+
+class QueryLog:
+    """execute_wrapper, запоминающий форму и время каждого запроса."""
+
+    def __init__(self, ignore_tables=()):
+        self.ignore = tuple(f'"{table}"' for table in ignore_tables)
+        self.shapes = Counter()
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            if not (sql.startswith(SAVEPOINTS)
+                    or any(table in sql for table in self.ignore)):
+                self.record(sql, time.perf_counter() - started)
+
+    def record(self, sql, duration):
+        self.duration += duration
+        self.count += 1
+        self.shapes[PLACEHOLDERS.sub('%s, ...', sql)] += 1
+
+    def repeated(self, limit):
+        """Формы запросов, повторённые больше limit раз."""
+        return {sql: total for sql, total in self.shapes.items()
+                if total > limit}
+
+
+class QueryBudgetMiddleware:
+    def __init__(self, get_response):
+        if not settings.QUERY_BUDGET_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        log = QueryLog(settings.QUERY_BUDGET_IGNORE_TABLES)
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(log))
+            response = self.get_response(request)
+        self.check(request, log)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = getattr(view_func, 'query_budget', None)
+
+    def check(self, request, log):
+        match = request.resolver_match
+        view_name = match.view_name if match else request.path
+        budget = getattr(request, 'query_budget', None)
+        logger.debug('%s: %d queries in %.1f ms',
+                     view_name, log.count, log.duration * 1000)
+        problems = []
+        if budget is not None and log.count > budget:
+            problems.append(
+                f'{log.count} queries, budget is {budget}')
+        for sql, total in log.repeated(
+                settings.QUERY_BUDGET_REPEAT_LIMIT).items():
+            problems.append(f'N+1: {total} x {sql}')
+        if not problems:
+            return
+        for problem in problems:
+            logger.warning('%s: %s', view_name, problem)
+        if settings.QUERY_BUDGET_RAISE:
+            raise QueryBudgetExceeded(
+                f'{view_name}: ' + '; '.join(problems))
+
+
+class ReplicaMiddleware:
+    safe_methods = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        if not settings.USE_REPLICA:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with db_routers.request_state() as state:
+            response = self.get_response(request)
+        if state.wrote or request.method not in self.safe_methods:
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE, '1',
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        app = view_func.__module__.split('.', 1)[0]
+        if (request.method in self.safe_methods
+                and app in settings.REPLICA_APPS
+                and settings.REPLICA_PIN_COOKIE not in request.COOKIES):
+            db_routers.read_from_replica()
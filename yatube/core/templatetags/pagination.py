@@ -0,0 +1,12 @@
+from django import template
+
+register = template.Library()
+
+
+@register.filter
+def page_window(page_obj):
+    """Окно номеров страниц вокруг текущей вместо полного page_range."""
+    paginator = page_obj.paginator
+    if hasattr(paginator, 'get_elided_page_range'):
+        return paginator.get_elided_page_range(page_obj.number)
+    return paginator.page_range
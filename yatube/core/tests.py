@@ -0,0 +1,324 @@
+import multiprocessing
+import tempfile
+import threading
+import time
+from shutil import rmtree
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connection
+from django.http import HttpResponse
+from django.test import (RequestFactory, SimpleTestCase, TestCase,
+                         override_settings)
+
+from core.cache import BUMPED_KEY, bump_generation, get_or_recompute
+from core.cache_backends.sqlite import SQLiteCache
+from core.cache_backends.tiered import TieredCache
+from core.db_routers import REPLICA, ReplicaRouter
+from core.middleware import ReplicaMiddleware
+from posts import views
+from posts.models import Post
+
+
+def _set_in_child(location):
+    SQLiteCache(location, {}).set('shared', 'из другого процесса')
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.location = f'{self.dir}/cache.sqlite3'
+        self.cache = SQLiteCache(self.location, {})
+
+    def tearDown(self):
+        rmtree(self.dir, ignore_errors=True)
+
+    def test_set_get_delete(self):
+        """Базовые операции кэша."""
+        self.cache.set('key', {'value': 1})
+        self.assertEqual(self.cache.get('key'), {'value': 1})
+        self.assertTrue(self.cache.has_key('key'))
+        self.cache.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_expiration(self):
+        """Просроченная запись не возвращается."""
+        self.cache.set('key', 'value', 0.05)
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertTrue(self.cache.add('key', 'new'))
+        self.assertFalse(self.cache.add('key', 'other'))
+        self.assertEqual(self.cache.get('key'), 'new')
+
+    def test_add(self):
+        """add не перезаписывает живую запись."""
+        self.assertTrue(self.cache.add('key', 'first'))
+        self.assertFalse(self.cache.add('key', 'second'))
+        self.assertEqual(self.cache.get('key'), 'first')
+        self.cache.set('key', 'third')
+        self.assertEqual(self.cache.get('key'), 'third')
+
+    def test_cull_by_entries(self):
+        """
+        При превышении MAX_ENTRIES сначала удаляются просроченные
+        записи, затем часть самых давно не читанных.
+        """
+        cache = SQLiteCache(self.location, {
+            'OPTIONS': {'MAX_ENTRIES': 4, 'CULL_FREQUENCY': 2,
+                        'TOUCH_INTERVAL': 0}})
+        cache.set('expired', 'value', 0.05)
+        time.sleep(0.1)
+        for key in ('a', 'b', 'c'):
+            cache.set(key, 'value')
+        cache.get('a')
+        cache.set('d', 'value')
+        self.assertEqual(
+            [key for key in ('a', 'b', 'c', 'd') if cache.has_key(key)],
+            ['a', 'b', 'c', 'd'])
+        cache.set('e', 'value')
+        self.assertEqual(
+            [key for key in ('a', 'b', 'c', 'd', 'e') if cache.has_key(key)],
+            ['a', 'd', 'e'])
+
+    def test_cull_frequency_zero_clears(self):
+        cache = SQLiteCache(self.location, {
+            'OPTIONS': {'MAX_ENTRIES': 2, 'CULL_FREQUENCY': 0}})
+        cache.set('a', 'value')
+        cache.set('b', 'value')
+        cache.set('c', 'value')
+        self.assertIsNone(cache.get('a'))
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 'value')
+
+    def test_incr(self):
+        """incr атомарно увеличивает значение."""
+        self.cache.set('counter', 1)
+        self.assertEqual(self.cache.incr('counter', 5), 6)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_lru_eviction_by_size(self):
+        """При превышении MAX_SIZE вытесняются давно не читанные ключи."""
+        cache = SQLiteCache(self.location, {'OPTIONS': {
+            'MAX_SIZE': 10_000, 'TOUCH_INTERVAL': 0}})
+        cache.set('old', 'x' * 4000)
+        cache.set('hot', 'x' * 4000)
+        cache.get('hot')
+        cache.set('new', 'x' * 4000)
+        self.assertIsNone(cache.get('old'))
+        self.assertIsNotNone(cache.get('hot'))
+        self.assertIsNotNone(cache.get('new'))
+
+    def test_shared_between_processes(self):
+        """Запись одного процесса видна другому."""
+        process = multiprocessing.Process(target=_set_in_child,
+                                          args=(self.location,))
+        process.start()
+        process.join()
+        self.assertEqual(self.cache.get('shared'), 'из другого процесса')
+
+
+@override_settings(CACHE_LOCK_TIMEOUT=5, CACHE_STALE_TIMEOUT=60)
+class StampedeTests(SimpleTestCase):
+    """Нагрузочная проверка: много потоков запрашивают один горячий ключ."""
+
+    workers = 20
+
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+        self.calls_lock = threading.Lock()
+
+    def compute(self):
+        with self.calls_lock:
+            self.calls += 1
+        time.sleep(0.2)
+        return f'значение {self.calls}'
+
+    def hammer(self, timeout=60):
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(
+                get_or_recompute('hot', self.compute, timeout)))
+            for _ in range(self.workers)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_cold_key_computed_once(self):
+        """Пустой ключ пересчитывает один поток, остальные ждут его."""
+        results = self.hammer()
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(set(results), {'значение 1'})
+
+    def test_expired_key_serves_stale(self):
+        """Истёкший ключ пересчитывает один поток, остальные отдают старое."""
+        cache.set('hot', ('старое', 0.2, time.time() - 1), 60)
+        results = self.hammer()
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results.count('значение 1'), 1)
+        self.assertEqual(results.count('старое'), self.workers - 1)
+
+    def test_failed_compute_does_not_block_waiters(self):
+        """Если пересчёт упал, ожидающие не ждут таймаут, а считают сами."""
+        def compute():
+            with self.calls_lock:
+                self.calls += 1
+            time.sleep(0.2)
+            raise ValueError('Не получилось')
+
+        errors = []
+
+        def request():
+            try:
+                get_or_recompute('hot', compute, 60)
+            except ValueError as error:
+                errors.append(error)
+
+        threads = [threading.Thread(target=request) for _ in range(3)]
+        started = time.time()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertLess(time.time() - started, 2)
+        self.assertEqual(len(errors), 3)
+        self.assertIsNone(cache.get('hot:lock'))
+
+    def test_uncacheable_result_does_not_block_waiters(self):
+        """Несохранённый результат тоже не заставляет ждать таймаут."""
+        threads = [
+            threading.Thread(target=get_or_recompute, args=(
+                'hot', self.compute, 60),
+                kwargs={'cacheable': lambda value: False})
+            for _ in range(3)
+        ]
+        started = time.time()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertLess(time.time() - started, 2)
+        self.assertEqual(self.calls, 3)
+
+    def test_foreign_lock_is_not_released(self):
+        """Воркер не снимает блокировку, которую взял не он."""
+        cache.set('hot:lock', 'чужой токен', 60)
+        with self.settings(CACHE_LOCK_TIMEOUT=0.1):
+            get_or_recompute('hot', lambda: 'значение', 60)
+        self.assertEqual(cache.get('hot:lock'), 'чужой токен')
+
+
+class TieredCacheTests(SimpleTestCase):
+    """Два экземпляра TieredCache изображают два процесса."""
+
+    def setUp(self):
+        cache.clear()
+        params = {'OPTIONS': {'POLL_INTERVAL': 0}}
+        self.first = TieredCache('default', params)
+        self.second = TieredCache('default', params)
+
+    def test_reads_go_through_tiers(self):
+        """Первое чтение из общего кэша, следующее - из памяти процесса."""
+        self.first.set('card:1', 'карточка')
+        self.assertEqual(self.second.get('card:1'), 'карточка')
+        self.assertEqual(self.second.get('card:1'), 'карточка')
+        self.assertIsNone(self.second.get('card:2'))
+        self.assertEqual(self.second.stats(), {
+            'card': {'l1_hits': 1, 'l2_hits': 1, 'misses': 1}})
+
+    def test_invalidation_reaches_other_process(self):
+        """Запись и удаление в одном процессе сбрасывают L1 в другом."""
+        self.first.set('card:1', 'старая')
+        self.assertEqual(self.second.get('card:1'), 'старая')
+        self.first.set('card:1', 'новая')
+        self.assertEqual(self.second.get('card:1'), 'новая')
+        self.first.delete('card:1')
+        self.assertIsNone(self.second.get('card:1'))
+
+    def test_shared_clear_drops_local_entries(self):
+        """Очистка общего кэша сбрасывает L1 всех процессов."""
+        self.first.set('card:1', 'карточка')
+        self.assertEqual(self.second.get('card:1'), 'карточка')
+        cache.clear()
+        self.assertIsNone(self.second.get('card:1'))
+
+
+@override_settings(USE_REPLICA=True)
+class ReplicaRoutingTests(SimpleTestCase):
+    """Какую базу выбирает роутер внутри запроса."""
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+
+    def route(self, request, view=views.index, write=False):
+        """Прогоняет запрос через middleware и запоминает выбор базы."""
+        chosen = {}
+
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            if write:
+                self.router.db_for_write(Post)
+            chosen['db'] = self.router.db_for_read(Post)
+            return HttpResponse()
+
+        middleware = ReplicaMiddleware(get_response)
+        return chosen, middleware(request)
+
+    def test_get_reads_replica(self):
+        chosen, response = self.route(self.factory.get('/'))
+        self.assertEqual(chosen['db'], REPLICA)
+        self.assertNotIn('primary_pin', response.cookies)
+
+    def test_write_pins_primary(self):
+        """После записи чтение и следующие запросы идут в основную базу."""
+        chosen, response = self.route(self.factory.get('/'), write=True)
+        self.assertEqual(chosen['db'], DEFAULT_DB_ALIAS)
+        self.assertIn('primary_pin', response.cookies)
+        request = self.factory.get('/')
+        request.COOKIES['primary_pin'] = '1'
+        chosen, response = self.route(request)
+        self.assertEqual(chosen['db'], DEFAULT_DB_ALIAS)
+
+    def test_post_and_other_apps_use_primary(self):
+        chosen, response = self.route(self.factory.post('/'))
+        self.assertEqual(chosen['db'], DEFAULT_DB_ALIAS)
+        self.assertIn('primary_pin', response.cookies)
+        chosen, response = self.route(self.factory.get('/'),
+                                      view=ReplicaRoutingTests)
+        self.assertEqual(chosen['db'], DEFAULT_DB_ALIAS)
+
+    def test_lagging_replica_is_not_cached(self):
+        """Сразу после записи прочитанное с реплики не попадает в кэш."""
+        cache.clear()
+        bump_generation('posts')
+
+        def get_response(request):
+            middleware.process_view(request, views.index, (), {})
+            get_or_recompute('page', lambda: 'с реплики', 60)
+            return HttpResponse()
+
+        middleware = ReplicaMiddleware(get_response)
+        middleware(self.factory.get('/'))
+        self.assertIsNone(cache.get('page'))
+        cache.set(BUMPED_KEY, time.time() - settings.REPLICA_PIN_SECONDS)
+        middleware(self.factory.get('/'))
+        self.assertIsNotNone(cache.get('page'))
+
+    def test_outside_request_uses_primary(self):
+        self.assertEqual(self.router.db_for_read(Post), DEFAULT_DB_ALIAS)
+        self.assertFalse(self.router.allow_migrate(REPLICA, 'posts'))
+
+
+class SQLiteTuningTests(TestCase):
+    def test_pragmas_applied(self):
+        """Новое соединение получает прагмы из SQLITE_PRAGMAS."""
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone(), (5000,))
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone(), (1,))
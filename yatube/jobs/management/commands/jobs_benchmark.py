@@ -0,0 +1,57 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from jobs.models import Job
+from jobs.queue import enqueue
+from jobs.worker import Worker
+
+
+class Command(BaseCommand):
+    help = ('Измеряет скорость постановки задач в очередь и их выборки '
+            'воркером на пустых задачах jobs.noop.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--jobs', type=int, default=5000)
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--processes', action='store_true')
+        parser.add_argument('--batch', type=int, default=100,
+                            help='Задач в одной транзакции при постановке.')
+
+    def handle(self, *args, **options):
+        total = options['jobs']
+        if Job.objects.filter(status=Job.PENDING).exists():
+            self.stderr.write(self.style.WARNING(
+                'В очереди уже есть задачи: воркер выполнит и их'))
+
+        started = time.perf_counter()
+        for _ in range(total // 2):
+            enqueue('jobs.noop')
+        single = time.perf_counter() - started
+
+        started = time.perf_counter()
+        batch = options['batch']
+        for low in range(total // 2, total, batch):
+            with transaction.atomic():
+                for _ in range(min(batch, total - low)):
+                    enqueue('jobs.noop')
+        batched = time.perf_counter() - started
+
+        worker = Worker(concurrency=options['concurrency'],
+                        processes=options['processes'],
+                        poll_interval=0.01)
+        started = time.perf_counter()
+        worker.run(burst=True)
+        drained = time.perf_counter() - started
+
+        self.stdout.write(
+            f'enqueue, по одной транзакции: '
+            f'{total // 2 / single:.0f} задач/с')
+        self.stdout.write(
+            f'enqueue, по {batch} в транзакции: '
+            f'{(total - total // 2) / batched:.0f} задач/с')
+        self.stdout.write(
+            f'dequeue и выполнение, {options["concurrency"]} '
+            f'{"процессов" if options["processes"] else "потоков"}: '
+            f'{worker.processed / drained:.0f} задач/с')
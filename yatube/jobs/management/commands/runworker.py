@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from jobs.worker import Worker
+
+
+class Command(BaseCommand):
+    help = 'Выполняет фоновые задачи из очереди jobs.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=4,
+                            help='Размер пула потоков или процессов.')
+        parser.add_argument('--processes', action='store_true',
+                            help='Выполнять задачи в процессах, '
+                                 'а не в потоках.')
+        parser.add_argument('--poll-interval', type=float,
+                            default=settings.JOBS_POLL_INTERVAL)
+        parser.add_argument('--visibility-timeout', type=int,
+                            default=settings.JOBS_VISIBILITY_TIMEOUT)
+        parser.add_argument('--burst', action='store_true',
+                            help='Выйти, когда очередь опустеет.')
+
+    def handle(self, *args, **options):
+        worker = Worker(
+            concurrency=options['concurrency'],
+            processes=options['processes'],
+            poll_interval=options['poll_interval'],
+            visibility_timeout=options['visibility_timeout'],
+        )
+        pool = 'процессов' if options['processes'] else 'потоков'
+        self.stdout.write(
+            f'Воркер {worker.name}: {options["concurrency"]} {pool}')
+        worker.run(burst=options['burst'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Выполнено задач: {worker.processed}, '
+            f'неудачных попыток: {worker.failed}'))
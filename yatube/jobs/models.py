@@ -0,0 +1,48 @@
+from django.db import models
+
+
+class Job(models.Model):
+    """Фоновая задача в очереди."""
+
+    PENDING = 'pending'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'ожидает'),
+        (FAILED, 'не выполнена'),
+    )
+
+    name = models.CharField(verbose_name='Задача', max_length=200)
+    payload = models.TextField(verbose_name='Аргументы в JSON')
+    priority = models.SmallIntegerField(
+        verbose_name='Приоритет',
+        default=0,
+        help_text='Задачи с большим приоритетом выполняются раньше.',
+    )
+    status = models.CharField(verbose_name='Состояние', max_length=10,
+                              choices=STATUSES, default=PENDING)
+    run_at = models.DateTimeField(
+        verbose_name='Доступна с',
+        help_text='Воркер, взявший задачу, сдвигает время на таймаут '
+                  'видимости: если он упадёт, задачу возьмёт другой.',
+    )
+    attempts = models.PositiveSmallIntegerField(
+        verbose_name='Попыток', default=0)
+    max_attempts = models.PositiveSmallIntegerField(
+        verbose_name='Максимум попыток')
+    locked_by = models.CharField(verbose_name='Воркер', max_length=100,
+                                 blank=True)
+    last_error = models.TextField(verbose_name='Последняя ошибка',
+                                  blank=True)
+    created = models.DateTimeField(verbose_name='Создана',
+                                   auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'задача'
+        verbose_name_plural = 'задачи'
+        indexes = (
+            models.Index(fields=('status', '-priority', 'run_at'),
+                         name='job_pending_idx'),
+        )
+
+    def __str__(self):
+        return f'{self.name} #{self.pk}'
@@ -0,0 +1,171 @@
+"""
+Очередь фоновых задач в таблице Job.
+
+Задача объявляется декоратором task в модуле tasks.py приложения
+и ставится в очередь через .delay(). Строка Job пишется в текущей
+транзакции: внутри atomic() задача появляется в очереди только вместе
+с данными, ради которых её поставили. ATOMIC_REQUESTS выключен,
+поэтому задача из view или сигнала фиксируется отдельно от данных,
+и задача должна сама проверять, что её данные на месте.
+
+Воркер забирает задачи claim(): в одной транзакции выбирает доступные
+по приоритету и времени и сдвигает их run_at на таймаут видимости.
+Если воркер упадёт, не завершив задачу, она снова станет доступна,
+когда таймаут истечёт. Выполненная задача удаляется, упавшая
+возвращается в очередь с экспоненциальной задержкой, а после
+max_attempts попыток остаётся в таблице в состоянии FAILED.
+"""
+import json
+import random
+from datetime import timedelta
+from importlib import import_module
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+_registry = {}
+
+
+class Task:
+    def __init__(self, func, name, priority, max_attempts):
+        self.func = func
+        self.name = name
+        self.priority = priority
+        self.max_attempts = max_attempts
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def __repr__(self):
+        return f'<Task {self.name}>'
+
+    def delay(self, *args, **kwargs):
+        """Ставит задачу в очередь с аргументами args и kwargs."""
+        return enqueue(self.name, args, kwargs)
+
+
+def task(name=None, priority=0, max_attempts=None):
+    """
+    Регистрирует функцию как фоновую задачу. Аргументы задачи должны
+    сериализоваться в JSON.
+
+        @task(priority=10)
+        def send_mail(subject, message, recipients):
+            ...
+
+        send_mail.delay('Тема', 'Текст', ['user@example.com'])
+    """
+    def decorator(func):
+        registered = Task(
+            func,
+            name or f'{func.__module__}.{func.__name__}',
+            priority,
+            max_attempts or settings.JOBS_MAX_ATTEMPTS,
+        )
+        _registry[registered.name] = registered
+        return registered
+    return decorator
+
+
+def get_task(name):
+    """Задача по имени; модуль задачи импортируется при необходимости."""
+    if name not in _registry:
+        import_module(name.rpartition('.')[0])
+    return _registry[name]
+
+
+def enqueue(name, args=(), kwargs=None, priority=None, delay=0):
+    """Создаёт задачу name; delay - через сколько секунд её выполнить."""
+    registered = get_task(name)
+    if settings.JOBS_EAGER:
+        registered(*args, **(kwargs or {}))
+        return None
+    return Job.objects.create(
+        name=name,
+        payload=json.dumps({'args': list(args), 'kwargs': kwargs or {}}),
+        priority=registered.priority if priority is None else priority,
+        run_at=timezone.now() + timedelta(seconds=delay),
+        max_attempts=registered.max_attempts,
+    )
+
+
+def claim(worker, limit, visibility_timeout=None):
+    """
+    Забирает до limit доступных задач для воркера worker.
+    Пока не истечёт visibility_timeout секунд, другие воркеры их не видят.
+    """
+    timeout = visibility_timeout or settings.JOBS_VISIBILITY_TIMEOUT
+    now = timezone.now()
+    with transaction.atomic():
+        # На SQLite транзакция начинается с BEGIN IMMEDIATE, и два
+        # воркера не выберут одни и те же строки. На других базах
+        # занятые строки пропускает SKIP LOCKED.
+        ids = list(
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status=Job.PENDING, run_at__lte=now,
+                    attempts__lt=F('max_attempts'))
+            .order_by('-priority', 'run_at', 'pk')
+            .values_list('pk', flat=True)[:limit])
+        if not ids:
+            return []
+        Job.objects.filter(pk__in=ids).update(
+            run_at=now + timedelta(seconds=timeout),
+            locked_by=worker,
+            attempts=F('attempts') + 1,
+        )
+        return list(Job.objects.filter(pk__in=ids).order_by(
+            '-priority', 'pk'))
+
+
+def extend(job_ids, worker, visibility_timeout=None):
+    """Продлевает видимость задач, которые воркер ещё выполняет."""
+    timeout = visibility_timeout or settings.JOBS_VISIBILITY_TIMEOUT
+    return Job.objects.filter(pk__in=job_ids, locked_by=worker).update(
+        run_at=timezone.now() + timedelta(seconds=timeout))
+
+
+def backoff(attempts):
+    """Задержка перед повтором: экспонента с разбросом до 50%."""
+    delay = min(settings.JOBS_RETRY_BACKOFF * 2 ** (attempts - 1),
+                settings.JOBS_RETRY_BACKOFF_MAX)
+    return delay * random.uniform(0.5, 1)
+
+
+def run(job):
+    """Выполняет задачу в текущем процессе."""
+    payload = json.loads(job.payload)
+    get_task(job.name)(*payload['args'], **payload['kwargs'])
+
+
+def complete(jobs, worker):
+    """Удаляет выполненные задачи, если их не перехватил другой воркер."""
+    Job.objects.filter(pk__in=[job.pk for job in jobs],
+                       locked_by=worker).delete()
+
+
+def fail(job, error):
+    """Возвращает задачу в очередь с задержкой или помечает упавшей."""
+    changes = {'locked_by': '', 'last_error': error}
+    if job.attempts >= job.max_attempts:
+        changes['status'] = Job.FAILED
+    else:
+        changes['run_at'] = timezone.now() + timedelta(
+            seconds=backoff(job.attempts))
+    Job.objects.filter(pk=job.pk, locked_by=job.locked_by).update(**changes)
+
+
+def expire():
+    """
+    Помечает FAILED задачи, последнюю попытку которых взял
+    и не завершил упавший воркер.
+    """
+    return Job.objects.filter(
+        status=Job.PENDING, run_at__lte=timezone.now(),
+        attempts__gte=F('max_attempts'),
+    ).update(
+        status=Job.FAILED, locked_by='',
+        last_error='Таймаут видимости истёк на последней попытке')
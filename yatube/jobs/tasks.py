@@ -0,0 +1,6 @@
+from .queue import task
+
+
+@task(name='jobs.noop')
+def noop():
+    """Пустая задача для jobs_benchmark."""
@@ -0,0 +1,131 @@
+from datetime import timedelta
+
+from django.core import mail
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from posts import tasks as posts_tasks
+from posts.models import FeedItem, Follow, Post, User
+
+from . import queue
+from .models import Job
+from .worker import Worker
+
+calls = []
+
+
+@queue.task(name='jobs.tests.record')
+def record(value):
+    calls.append(value)
+
+
+@queue.task(name='jobs.tests.explode', max_attempts=2)
+def explode():
+    raise ValueError('Не получилось')
+
+
+class QueueTests(TestCase):
+    def test_enqueue_and_claim_by_priority(self):
+        """Задачи выдаются по приоритету, затем по времени постановки."""
+        low = queue.enqueue('jobs.tests.record', (1,))
+        high = queue.enqueue('jobs.tests.record', (2,), priority=10)
+        queue.enqueue('jobs.tests.record', (3,), delay=60)
+        claimed = queue.claim('worker', 10)
+        self.assertEqual([job.pk for job in claimed], [high.pk, low.pk])
+        self.assertEqual(claimed[0].attempts, 1)
+        self.assertEqual(claimed[0].locked_by, 'worker')
+
+    def test_visibility_timeout(self):
+        """Взятая задача не видна другим, пока не истечёт таймаут."""
+        job = queue.enqueue('jobs.tests.record', (1,))
+        self.assertEqual(len(queue.claim('first', 1, 60)), 1)
+        self.assertEqual(queue.claim('second', 1, 60), [])
+        Job.objects.filter(pk=job.pk).update(
+            run_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(queue.claim('second', 1, 60)[0].attempts, 2)
+
+    def test_fail_retries_with_backoff(self):
+        """Упавшая задача возвращается в очередь позже, затем - FAILED."""
+        queue.enqueue('jobs.tests.explode')
+        job = queue.claim('worker', 1)[0]
+        queue.fail(job, 'ошибка')
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.PENDING)
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertEqual(job.last_error, 'ошибка')
+
+        Job.objects.update(run_at=timezone.now())
+        job = queue.claim('worker', 1)[0]
+        queue.fail(job, 'снова ошибка')
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(queue.claim('worker', 1), [])
+
+    def test_expire_last_attempt(self):
+        """Последняя попытка упавшего воркера помечается FAILED."""
+        job = queue.enqueue('jobs.tests.explode')
+        Job.objects.filter(pk=job.pk).update(
+            attempts=2, run_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(queue.claim('worker', 1), [])
+        self.assertEqual(queue.expire(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+
+    @override_settings(JOBS_EAGER=True)
+    def test_eager(self):
+        calls.clear()
+        self.assertIsNone(queue.enqueue('jobs.tests.record', (5,)))
+        self.assertEqual(calls, [5])
+        self.assertFalse(Job.objects.exists())
+
+
+class WorkerTests(TransactionTestCase):
+    def test_burst_run(self):
+        """Воркер выполняет задачи в пуле и выходит на пустой очереди."""
+        calls.clear()
+        for value in range(10):
+            queue.enqueue('jobs.tests.record', (value,))
+        queue.enqueue('jobs.tests.explode')
+        worker = Worker(concurrency=3, poll_interval=0.01)
+        with self.assertLogs('yatube.jobs', 'WARNING'):
+            worker.run(burst=True)
+        self.assertEqual(sorted(calls), list(range(10)))
+        self.assertEqual(worker.processed, 10)
+        self.assertEqual(worker.failed, 1)
+        failed = Job.objects.get()
+        self.assertEqual(failed.name, 'jobs.tests.explode')
+        self.assertIn('ValueError', failed.last_error)
+
+
+class MovedWorkTests(TestCase):
+    def test_password_reset_email_is_queued(self):
+        User.objects.create_user(username='user', email='user@example.com',
+                                 password='secret-password')
+        self.client.post('/auth/password_reset/',
+                         {'email': 'user@example.com'})
+        self.assertEqual(len(mail.outbox), 0)
+        job = Job.objects.get(name='users.tasks.send_email')
+        queue.run(job)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn('/auth/reset/', mail.outbox[0].body)
+
+    @override_settings(FEED_FANOUT_INLINE_LIMIT=1)
+    def test_large_fan_out_is_queued(self):
+        author = User.objects.create_user(username='author')
+        for username in ('first', 'second'):
+            Follow.objects.create(
+                user=User.objects.create_user(username=username),
+                author=author)
+        post = Post.objects.create(author=author, text='Пост')
+        self.assertFalse(FeedItem.objects.exists())
+        queue.run(Job.objects.get(name='posts.tasks.fan_out_post'))
+        self.assertEqual(FeedItem.objects.filter(post=post).count(), 2)
+
+    def test_repair_counters_task(self):
+        author = User.objects.create_user(username='author')
+        Post.objects.create(author=author, text='Пост')
+        author.stats.delete()
+        posts_tasks.repair_counters.delay(100)
+        queue.run(Job.objects.get(name='posts.tasks.repair_counters'))
+        author.refresh_from_db()
+        self.assertEqual(author.stats.post_count, 1)
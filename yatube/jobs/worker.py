@@ -0,0 +1,128 @@
+"""
+Воркер очереди задач.
+
+Главный поток забирает задачи claim() по числу свободных мест в пуле
+потоков или процессов, отдаёт их пулу и по завершении пачкой удаляет
+выполненные и возвращает упавшие в очередь. Пока задачи выполняются,
+воркер раз в половину таймаута видимости продлевает их, чтобы долгую
+задачу не взял другой воркер. SIGTERM и SIGINT останавливают приём
+новых задач, уже начатые доделываются.
+"""
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import time
+import traceback
+from concurrent.futures import (FIRST_COMPLETED, ProcessPoolExecutor,
+                                ThreadPoolExecutor, wait)
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+
+from . import queue
+from .models import Job
+
+logger = logging.getLogger('yatube.jobs')
+
+
+def execute(name, payload):
+    """Выполняет задачу в потоке или процессе пула."""
+    close_old_connections()
+    try:
+        queue.run(Job(name=name, payload=payload))
+    finally:
+        close_old_connections()
+
+
+class Worker:
+    def __init__(self, concurrency=4, processes=False, poll_interval=None,
+                 visibility_timeout=None):
+        self.name = f'{socket.gethostname()}:{os.getpid()}'
+        self.concurrency = concurrency
+        self.processes = processes
+        self.poll_interval = poll_interval or settings.JOBS_POLL_INTERVAL
+        self.visibility_timeout = (visibility_timeout
+                                   or settings.JOBS_VISIBILITY_TIMEOUT)
+        self.running = {}
+        self.stopping = False
+        self.processed = self.failed = 0
+
+    def stop(self, *args):
+        self.stopping = True
+
+    def make_pool(self):
+        if not self.processes:
+            return ThreadPoolExecutor(self.concurrency,
+                                      thread_name_prefix='jobs')
+        # Дочерние процессы не должны унаследовать открытые соединения.
+        connections.close_all()
+        return ProcessPoolExecutor(
+            self.concurrency, mp_context=multiprocessing.get_context('fork'))
+
+    def run(self, burst=False):
+        """
+        Выполняет задачи, пока воркер не остановят.
+        С burst=True выходит, когда очередь опустеет.
+        """
+        handlers = {signum: signal.signal(signum, self.stop)
+                    for signum in (signal.SIGTERM, signal.SIGINT)}
+        try:
+            with self.make_pool() as pool:
+                self.loop(pool, burst)
+                self.finish(wait(self.running).done)
+        finally:
+            for signum, handler in handlers.items():
+                signal.signal(signum, handler)
+
+    def loop(self, pool, burst):
+        extended = time.monotonic()
+        while not self.stopping:
+            if time.monotonic() - extended > self.visibility_timeout / 2:
+                self.heartbeat()
+                extended = time.monotonic()
+            claimed = self.fill(pool)
+            if not self.running:
+                if burst and not claimed:
+                    return
+                time.sleep(self.poll_interval)
+                continue
+            done, _ = wait(self.running, timeout=self.poll_interval,
+                           return_when=FIRST_COMPLETED)
+            self.finish(done)
+
+    def fill(self, pool):
+        free = self.concurrency - len(self.running)
+        if free <= 0:
+            return 0
+        jobs = queue.claim(self.name, free, self.visibility_timeout)
+        for job in jobs:
+            future = pool.submit(execute, job.name, job.payload)
+            self.running[future] = job
+        return len(jobs)
+
+    def finish(self, futures):
+        completed = []
+        for future in futures:
+            job = self.running.pop(future)
+            error = future.exception()
+            if error is None:
+                completed.append(job)
+                continue
+            self.failed += 1
+            logger.warning('%s: попытка %d не удалась: %r',
+                           job, job.attempts, error)
+            queue.fail(job, ''.join(traceback.format_exception(
+                type(error), error, error.__traceback__)))
+        if completed:
+            queue.complete(completed, self.name)
+            self.processed += len(completed)
+
+    def heartbeat(self):
+        if self.running:
+            queue.extend([job.pk for job in self.running.values()],
+                         self.name, self.visibility_timeout)
+        expired = queue.expire()
+        if expired:
+            logger.warning('Задач без попыток после таймаута: %d', expired)
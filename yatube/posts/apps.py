@@ -5,3 +5,6 @@ class PostsConfig(AppConfig):
     """Класс с конфигами аппликации."""
 
     name = 'posts'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,112 @@
+"""
+Денормализованные счётчики.
+
+Сигналы меняют счётчики F-выражениями сразу после записи, поэтому
+одновременные изменения не теряются. В одну транзакцию с записью
+счётчик попадает, только если запись сделана внутри atomic():
+ATOMIC_REQUESTS выключен, и в view запись и счётчик фиксируются
+по отдельности. Если процесс упадёт между ними, счётчик разойдётся
+с данными. recount_* пересчитывают счётчики по живым данным пачками,
+ими пользуется команда repair_counters.
+"""
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+
+from .models import Comment, Follow, Post, User, UserStats
+
+
+def _shift(field, delta):
+    """Счётчик не уходит в минус, даже если успел разойтись с данными."""
+    return Greatest(F(field) + delta, 0)
+
+
+def change_user_stats(user_id, delta, *fields):
+    """
+    Меняет счётчики пользователя на delta.
+    Если строки ещё нет, при увеличении она создаётся пересчётом.
+    """
+    updated = UserStats.objects.filter(user_id=user_id).update(
+        **{field: _shift(field, delta) for field in fields})
+    if not updated and delta > 0:
+        recount_users((user_id,))
+
+
+def change_comment_count(post_id, delta):
+    Post.objects.filter(pk=post_id).update(
+        comment_count=_shift('comment_count', delta))
+
+
+def stats_for(user):
+    """Счётчики пользователя; потерянная строка восстанавливается."""
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        recount_users((user.pk,))
+        return UserStats.objects.get(pk=user.pk)
+
+
+def _counts(queryset, field, ids):
+    return dict(
+        queryset.filter(**{f'{field}__in': ids})
+        .order_by()
+        .values(field)
+        .annotate(total=Count('pk'))
+        .values_list(field, 'total')
+    )
+
+
+def recount_users(user_ids):
+    """Пересчитывает счётчики пользователей по живым данным."""
+    user_ids = list(user_ids)
+    posts = _counts(Post.objects, 'author', user_ids)
+    followers = _counts(Follow.objects, 'author', user_ids)
+    following = _counts(Follow.objects, 'user', user_ids)
+    with transaction.atomic():
+        UserStats.objects.filter(user_id__in=user_ids).delete()
+        UserStats.objects.bulk_create(
+            UserStats(
+                user_id=user_id,
+                post_count=posts.get(user_id, 0),
+                follower_count=followers.get(user_id, 0),
+                following_count=following.get(user_id, 0),
+            )
+            for user_id in user_ids
+        )
+
+
+def recount_posts(post_ids):
+    """Пересчитывает количество комментариев у постов."""
+    post_ids = list(post_ids)
+    comments = _counts(Comment.objects, 'post', post_ids)
+    Post.objects.bulk_update(
+        [Post(pk=post_id, comment_count=comments.get(post_id, 0))
+         for post_id in post_ids],
+        ('comment_count',),
+    )
+
+
+def _batches(queryset, batch_size):
+    last_pk = 0
+    while True:
+        ids = list(queryset.filter(pk__gt=last_pk).order_by('pk')
+                   .values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return
+        yield ids
+        last_pk = ids[-1]
+
+
+def repair(batch_size=500):
+    """
+    Пересчитывает все счётчики пачками по batch_size.
+    Возвращает количество обработанных пользователей и постов.
+    """
+    users = posts = 0
+    for ids in _batches(User.objects.all(), batch_size):
+        recount_users(ids)
+        users += len(ids)
+    for ids in _batches(Post.objects.all(), batch_size):
+        recount_posts(ids)
+        posts += len(ids)
+    return users, posts
@@ -0,0 +1,159 @@
+"""
+Потоковая выгрузка постов и комментариев автора.
+
+Строки читаются queryset.iterator(chunk_size=CHUNK_SIZE) и сразу
+превращаются в байты JSONL или CSV, поэтому в памяти держится одна
+пачка строк БД при любом размере аккаунта. Поля записей совпадают с тем,
+что читает posts.importer, так что выгрузку можно загрузить обратно.
+
+zip с обеими выгрузками и картинками тоже собирается на лету: zipfile
+пишет в буфер без seek, а накопленные в нём байты отдаются сразу после
+каждой записи.
+"""
+import csv
+import json
+import time
+import zipfile
+
+from django.core.exceptions import SuspiciousFileOperation
+
+from .models import Comment, Post
+
+CHUNK_SIZE = 500
+FORMATS = ('jsonl', 'csv', 'zip')
+FIELDS = {
+    'posts': ('id', 'author', 'group', 'text', 'pub_date', 'image'),
+    'comments': ('id', 'post', 'author', 'text', 'pub_date'),
+}
+KINDS = tuple(FIELDS)
+CONTENT_TYPES = {
+    'jsonl': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+    'zip': 'application/zip',
+}
+
+
+def post_records(author):
+    rows = Post.objects.filter(author=author).order_by('pk').values_list(
+        'pk', 'group__slug', 'text', 'pub_date', 'image'
+    ).iterator(chunk_size=CHUNK_SIZE)
+    for pk, slug, text, pub_date, image in rows:
+        yield {
+            'id': pk,
+            'author': author.username,
+            'group': slug,
+            'text': text,
+            'pub_date': pub_date.isoformat(),
+            'image': image or None,
+        }
+
+
+def comment_records(author):
+    rows = Comment.objects.filter(author=author).order_by('pk').values_list(
+        'pk', 'post_id', 'text', 'pub_date'
+    ).iterator(chunk_size=CHUNK_SIZE)
+    for pk, post_id, text, pub_date in rows:
+        yield {
+            'id': pk,
+            'post': post_id,
+            'author': author.username,
+            'text': text,
+            'pub_date': pub_date.isoformat(),
+        }
+
+
+RECORDS = {
+    'posts': post_records,
+    'comments': comment_records,
+}
+
+
+def jsonl_lines(records):
+    for record in records:
+        yield (json.dumps(record, ensure_ascii=False) + '\n').encode()
+
+
+class _Echo:
+    """Файл для csv.writer, который возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(records, fields):
+    writer = csv.DictWriter(_Echo(), fieldnames=fields)
+    yield writer.writeheader().encode()
+    for record in records:
+        yield writer.writerow(record).encode()
+
+
+class _ZipBuffer:
+    """
+    Файл только для записи и без seek: zipfile в этом случае пишет
+    размеры после данных, а записанное забирается через drain().
+    """
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def _images(author):
+    return Post.objects.filter(author=author).exclude(image='').exclude(
+        image=None).order_by('pk').values_list(
+        'image', flat=True).iterator(chunk_size=CHUNK_SIZE)
+
+
+def zip_stream(author):
+    """zip с posts.jsonl, comments.jsonl и картинками постов."""
+    buffer = _ZipBuffer()
+    storage = Post._meta.get_field('image').storage
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for kind in KINDS:
+            with archive.open(f'{kind}.jsonl', 'w',
+                              force_zip64=True) as entry:
+                for line in jsonl_lines(RECORDS[kind](author)):
+                    entry.write(line)
+                    yield buffer.drain()
+        for name in _images(author):
+            try:
+                source = storage.open(name)
+            except (OSError, SuspiciousFileOperation):
+                # Импорт принимает любое имя картинки: битая ссылка
+                # не должна обрывать уже отдаваемый архив.
+                continue
+            # Картинки уже сжаты, поэтому кладутся без DEFLATE.
+            info = zipfile.ZipInfo(name, time.localtime()[:6])
+            info.compress_type = zipfile.ZIP_STORED
+            with source, archive.open(info, 'w', force_zip64=True) as entry:
+                for chunk in source.chunks():
+                    entry.write(chunk)
+                    yield buffer.drain()
+    yield buffer.drain()
+
+
+def stream(author, kind, fmt):
+    """Байты выгрузки kind автора в формате fmt."""
+    if fmt == 'zip':
+        return (chunk for chunk in zip_stream(author) if chunk)
+    records = RECORDS[kind](author)
+    if fmt == 'csv':
+        return csv_lines(records, FIELDS[kind])
+    return jsonl_lines(records)
+
+
+def filename(author, kind, fmt):
+    if fmt == 'zip':
+        return f'{author.username}.zip'
+    return f'{author.username}-{kind}.{fmt}'
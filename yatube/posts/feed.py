@@ -0,0 +1,86 @@
+"""
+Материализованная лента подписок.
+
+Каждая запись FeedItem связывает подписчика с постом автора,
+поэтому страница подписок читает один индексированный диапазон
+по пользователю вместо соединения Follow и Post.
+"""
+from django.db import transaction
+
+from .models import FeedItem, Follow, Post
+
+BATCH_SIZE = 500
+
+
+def _feed_items(user_ids, posts):
+    return (FeedItem(user_id=user_id, post_id=post_id,
+                     author_id=author_id, pub_date=pub_date)
+            for user_id in user_ids
+            for post_id, author_id, pub_date in posts)
+
+
+def fan_out_post(post, limit=None):
+    """
+    Раскладывает новый пост по лентам подписчиков автора.
+    Если подписчиков больше limit, ничего не пишет и возвращает False.
+    """
+    followers = Follow.objects.filter(
+        author_id=post.author_id).values_list('user_id', flat=True)
+    if limit is None:
+        followers = followers.iterator()
+    else:
+        followers = list(followers[:limit + 1])
+        if len(followers) > limit:
+            return False
+    FeedItem.objects.bulk_create(
+        _feed_items(followers, ((post.pk, post.author_id, post.pub_date),)),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    return True
+
+
+def backfill_follow(follow):
+    """Добавляет в ленту подписчика все посты нового автора."""
+    posts = Post.objects.filter(author_id=follow.author_id).values_list(
+        'pk', 'author_id', 'pub_date')
+    FeedItem.objects.bulk_create(
+        _feed_items((follow.user_id,), posts.iterator()),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def prune_follow(follow):
+    """Убирает из ленты подписчика посты автора, от которого отписались."""
+    FeedItem.objects.filter(user_id=follow.user_id,
+                            author_id=follow.author_id).delete()
+
+
+def rebuild(user=None):
+    """
+    Пересобирает ленту целиком или для одного пользователя.
+    Возвращает количество созданных записей.
+    """
+    follows = Follow.objects.all()
+    items = FeedItem.objects.all()
+    if user is not None:
+        follows = follows.filter(user=user)
+        items = items.filter(user=user)
+    with transaction.atomic():
+        items.delete()
+        for follow in follows.iterator():
+            backfill_follow(follow)
+    return items.count()
+
+
+def check(user):
+    """
+    Сравнивает ленту пользователя с живым соединением Follow и Post.
+    Возвращает пару множеств id постов: недостающие и лишние.
+    """
+    live = set(Post.objects.filter(
+        author__following__user=user).values_list('pk', flat=True))
+    stored = set(FeedItem.objects.filter(
+        user=user).values_list('post_id', flat=True))
+    return live - stored, stored - live
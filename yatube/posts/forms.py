@@ -1,5 +1,7 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 
+from . import images
 from .models import Comment, Post
 
 
@@ -25,6 +27,22 @@ class PostForm(forms.ModelForm):
             'image': 'Загрузи картинку и будет счастье.'
         }
 
+    def clean_image(self):
+        image = self.cleaned_data['image']
+        if not isinstance(image, UploadedFile):
+            return image
+        try:
+            return images.normalize(image) or image
+        except OSError:
+            raise forms.ValidationError(
+                self.fields['image'].error_messages['invalid_image'],
+                code='invalid_image')
+
+    def save(self, commit=True):
+        if 'image' in self.changed_data:
+            images.describe(self.instance)
+        return super().save(commit)
+
 
 class CommentForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
@@ -0,0 +1,122 @@
+"""
+Нормализация картинок постов при загрузке.
+
+Фото с телефона весит несколько мегабайт, и sorl-thumbnail декодирует
+его заново для каждого варианта из POST_IMAGE_VARIANTS. Поэтому
+картинка сразу уменьшается до POST_IMAGE_MAX_SIZE, поворачивается
+по EXIF и пересохраняется без метаданных. Исходник хранится только
+если он уже не больше, не повёрнут и без EXIF, а пересохранение его
+не уменьшает. Анимированные GIF, WebP и PNG не трогаются, а от
+многокадровых JPEG (MPO), которые снимают телефоны, остаётся первый
+кадр.
+"""
+import io
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.utils import dateformat
+from PIL import Image, ImageOps
+
+from core.cache import drop_fragment
+
+from . import media, thumbnails
+from .models import Post
+
+EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp'}
+# Форматы, в которых несколько кадров - это анимация.
+ANIMATED_FORMATS = ('GIF', 'PNG', 'WEBP')
+
+
+def is_animation(image):
+    return (image.format in ANIMATED_FORMATS
+            and getattr(image, 'is_animated', False))
+
+
+def has_alpha(image):
+    return 'A' in image.mode or 'transparency' in image.info
+
+
+def encode(image, format_):
+    """Сохраняет картинку в format_ без метаданных."""
+    options = {'icc_profile': image.info.get('icc_profile')}
+    if format_ == 'JPEG':
+        if image.mode == 'CMYK':
+            # Профиль CMYK не подходит картинке, переведённой в RGB.
+            options['icc_profile'] = None
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        options.update(quality=settings.POST_IMAGE_QUALITY,
+                       optimize=True, progressive=True)
+    elif format_ == 'WEBP':
+        options['quality'] = settings.POST_IMAGE_QUALITY
+    else:
+        options['optimize'] = True
+        if 'transparency' in image.info:
+            options['transparency'] = image.info['transparency']
+    buffer = io.BytesIO()
+    image.save(buffer, format_, **options)
+    return buffer.getvalue()
+
+
+def normalize(file):
+    """
+    Нормализованная копия картинки file в ContentFile
+    или None, если стоит сохранить исходник.
+    """
+    file.seek(0)
+    original = file.read()
+    with Image.open(io.BytesIO(original)) as image:
+        if is_animation(image):
+            return None
+        format_ = image.format
+        if format_ not in EXTENSIONS:
+            format_ = 'PNG' if has_alpha(image) else 'JPEG'
+        changed = format_ != image.format or bool(image.getexif())
+        normalized = ImageOps.exif_transpose(image)
+        if (normalized.width > settings.POST_IMAGE_MAX_SIZE[0]
+                or normalized.height > settings.POST_IMAGE_MAX_SIZE[1]):
+            normalized.thumbnail(settings.POST_IMAGE_MAX_SIZE,
+                                 Image.LANCZOS)
+            changed = True
+        data = encode(normalized, format_)
+    if not changed and len(data) >= len(original):
+        return None
+    name = os.path.splitext(os.path.basename(file.name))[0]
+    return ContentFile(data, name=f'{name}.{EXTENSIONS[format_]}')
+
+
+def describe(post):
+    """Записывает в пост размеры и вес его картинки."""
+    if post.image:
+        post.image_width = post.image.width
+        post.image_height = post.image.height
+        post.image_bytes = post.image.size
+    else:
+        post.image_width = post.image_height = post.image_bytes = None
+
+
+def normalize_stored(post):
+    """
+    Нормализует уже сохранённую картинку поста. Пост переходит на новый
+    файл, ссылка на старый убирается, миниатюры ставятся в очередь.
+    Возвращает размер картинки в байтах до и после.
+    """
+    old = post.image
+    before = old.size
+    with old.open('rb'):
+        normalized = normalize(old)
+    if normalized is not None:
+        name = old.field.generate_filename(post, normalized.name)
+        post.image = old.storage.save(name, normalized)
+    describe(post)
+    Post.objects.filter(pk=post.pk).update(
+        image=post.image.name, image_width=post.image_width,
+        image_height=post.image_height, image_bytes=post.image_bytes)
+    if normalized is not None and post.image.name != old.name:
+        media.retain(post.image.name)
+        media.release(old.name)
+        drop_fragment('post_card', post.pk,
+                      dateformat.format(post.updated, 'U.u'))
+        thumbnails.schedule(post.pk)
+    return before, post.image_bytes
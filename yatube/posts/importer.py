@@ -0,0 +1,358 @@
+"""
+Потоковый импорт групп, пользователей, постов, комментариев и подписок.
+
+Файл читается построчно (JSONL или CSV с заголовком), записи копятся
+в пачку и пишутся одним bulk_create, несколько пачек - в одной
+транзакции. После каждой транзакции в файл <имя>.checkpoint пишется
+смещение в байтах, с которого можно продолжить после падения.
+В памяти держатся только текущая транзакция и словари username -> id
+и slug -> id, поэтому размер входного файла не ограничен.
+
+bulk_create не отправляет сигналы, поэтому HTML текста поста считается
+здесь же, а ленты подписок, счётчики и поколения кэша пересчитываются
+в finish() после всего импорта. Поисковый индекс поддерживают триггеры.
+"""
+import csv
+import json
+import os
+from collections import Counter
+from contextlib import contextmanager
+
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core.cache import bump_generation
+
+from . import counters, feed, media
+from .models import Comment, Follow, Group, Post, User, render_text
+from .utils import count_cache_key
+
+FORMATS = ('jsonl', 'csv')
+
+
+class SkipRecord(Exception):
+    """Запись нельзя импортировать; текст - причина для отчёта."""
+
+
+def detect_format(path):
+    extension = os.path.splitext(path)[1].lstrip('.').lower()
+    return 'jsonl' if extension in ('json', 'jsonl', 'ndjson') else extension
+
+
+def _lines(stream, position):
+    """Строки бинарного потока; position[0] - смещение после последней."""
+    for line in iter(stream.readline, b''):
+        position[0] = stream.tell()
+        yield line.decode('utf-8')
+
+
+def read_records(stream, fmt, offset=0):
+    """
+    Записи файла начиная с offset: пары (запись, смещение после неё).
+    Для CSV заголовок читается всегда, даже при продолжении с offset.
+    """
+    position = [offset]
+    if fmt == 'csv':
+        header = next(csv.reader([stream.readline().decode('utf-8-sig')]))
+        stream.seek(max(offset, stream.tell()))
+        # csv.reader берёт строки по одной и не читает вперёд, поэтому
+        # после каждой записи position указывает ровно на её конец.
+        reader = csv.DictReader(_lines(stream, position), fieldnames=header)
+        for row in reader:
+            record = {key: value or None for key, value in row.items()}
+            yield record, position[0]
+        return
+    stream.seek(offset)
+    for line in _lines(stream, position):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        yield record, position[0]
+
+
+def _optional(record, field):
+    """Строковое поле записи или пустая строка."""
+    value = record.get(field)
+    if value in (None, ''):
+        return ''
+    if not isinstance(value, str):
+        raise SkipRecord(f'неверное поле {field}')
+    return value
+
+
+def _required(record, field):
+    value = _optional(record, field)
+    if not value:
+        raise SkipRecord(f'нет поля {field}')
+    return value
+
+
+def _date(record):
+    value = _optional(record, 'pub_date')
+    if not value:
+        return timezone.now()
+    date = parse_datetime(value)
+    if date is None:
+        raise SkipRecord('неверная дата')
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date)
+    return date
+
+
+def _pk(record, field='id'):
+    value = record.get(field)
+    if value in (None, ''):
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise SkipRecord(f'неверное поле {field}')
+    try:
+        return int(value)
+    except ValueError:
+        raise SkipRecord(f'неверное поле {field}')
+
+
+def _lookup(mapping, key, name):
+    try:
+        return mapping[key]
+    except KeyError:
+        raise SkipRecord(f'{name} не найден')
+
+
+@contextmanager
+def keep_dates(model):
+    """
+    bulk_create заменяет даты с auto_now_add и auto_now на текущее
+    время; на время импорта эти флаги снимаются.
+    """
+    fields = [field for field in model._meta.concrete_fields
+              if getattr(field, 'auto_now', False)
+              or getattr(field, 'auto_now_add', False)]
+    flags = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, flags):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Importer:
+    """
+    Импорт одного вида записей. build() превращает запись файла
+    в объект модели или поднимает SkipRecord.
+    """
+
+    model = None
+    users = groups = None
+    # Причина пропуска записей, отброшенных filter_batch().
+    filter_reason = None
+
+    def load_maps(self):
+        pass
+
+    def build(self, record):
+        raise NotImplementedError
+
+    def filter_batch(self, objects):
+        return objects
+
+
+class GroupImporter(Importer):
+    model = Group
+
+    def build(self, record):
+        slug = _required(record, 'slug')
+        return Group(slug=slug,
+                     title=_optional(record, 'title') or slug,
+                     description=_optional(record, 'description'))
+
+
+class UserImporter(Importer):
+    model = User
+
+    def build(self, record):
+        return User(username=_required(record, 'username'),
+                    first_name=_optional(record, 'first_name'),
+                    last_name=_optional(record, 'last_name'),
+                    email=_optional(record, 'email'),
+                    password=make_password(None))
+
+
+class PostImporter(Importer):
+    model = Post
+
+    def load_maps(self):
+        self.users = dict(User.objects.values_list('username', 'pk'))
+        self.groups = dict(Group.objects.values_list('slug', 'pk'))
+
+    def build(self, record):
+        text = _required(record, 'text')
+        slug = _optional(record, 'group')
+        pub_date = _date(record)
+        return Post(
+            pk=_pk(record),
+            text=text,
+            author_id=_lookup(self.users, _required(record, 'author'),
+                              'автор'),
+            group_id=_lookup(self.groups, slug, 'группа') if slug else None,
+            image=_optional(record, 'image'),
+            pub_date=pub_date,
+            updated=pub_date,
+            **render_text(text),
+        )
+
+
+class CommentImporter(Importer):
+    model = Comment
+    filter_reason = 'пост не найден'
+
+    def load_maps(self):
+        self.users = dict(User.objects.values_list('username', 'pk'))
+
+    def build(self, record):
+        post_id = _pk(record, 'post')
+        if post_id is None:
+            raise SkipRecord('нет поля post')
+        pub_date = _date(record)
+        return Comment(
+            pk=_pk(record),
+            post_id=post_id,
+            author_id=_lookup(self.users, _required(record, 'author'),
+                              'автор'),
+            text=_required(record, 'text'),
+            pub_date=pub_date,
+            updated=pub_date,
+        )
+
+    def filter_batch(self, objects):
+        """Комментарии к несуществующим постам отбрасываются пачкой."""
+        known = set(Post.objects.filter(
+            pk__in={comment.post_id for comment in objects}
+        ).values_list('pk', flat=True))
+        return [comment for comment in objects if comment.post_id in known]
+
+
+class FollowImporter(Importer):
+    model = Follow
+
+    def load_maps(self):
+        self.users = dict(User.objects.values_list('username', 'pk'))
+
+    def build(self, record):
+        user_id = _lookup(self.users, _required(record, 'user'),
+                          'пользователь')
+        author_id = _lookup(self.users, _required(record, 'author'), 'автор')
+        if user_id == author_id:
+            raise SkipRecord('подписка на себя')
+        return Follow(user_id=user_id, author_id=author_id)
+
+
+IMPORTERS = {
+    'groups': GroupImporter,
+    'users': UserImporter,
+    'posts': PostImporter,
+    'comments': CommentImporter,
+    'follows': FollowImporter,
+}
+
+
+def checkpoint_path(path):
+    return f'{path}.checkpoint'
+
+
+def read_checkpoint(path, kind):
+    """Смещение из чекпойнта импорта kind или 0."""
+    try:
+        with open(checkpoint_path(path)) as file:
+            state = json.load(file)
+    except (OSError, ValueError):
+        return 0
+    if state.get('kind') != kind:
+        return 0
+    return state['offset']
+
+
+def write_checkpoint(path, kind, offset):
+    temporary = checkpoint_path(path) + '.tmp'
+    with open(temporary, 'w') as file:
+        json.dump({'kind': kind, 'offset': offset}, file)
+    os.replace(temporary, checkpoint_path(path))
+
+
+def _save(importer, chunk, batch_size, skipped):
+    """Пишет накопленные объекты пачками в одной транзакции."""
+    with transaction.atomic():
+        for start in range(0, len(chunk), batch_size):
+            batch = chunk[start:start + batch_size]
+            objects = importer.filter_batch(batch)
+            if len(objects) < len(batch):
+                skipped[importer.filter_reason] += len(batch) - len(objects)
+            importer.model.objects.bulk_create(objects, ignore_conflicts=True)
+
+
+def run(kind, path, fmt=None, batch_size=1000, chunk_size=10000,
+        resume=False, progress=None):
+    """
+    Импортирует файл path. progress(records, offset, size) вызывается
+    после каждой транзакции. Возвращает число прочитанных за этот запуск
+    записей и Counter причин пропуска.
+    """
+    fmt = fmt or detect_format(path)
+    if fmt not in FORMATS:
+        raise ValueError(f'Неизвестный формат {fmt}')
+    importer = IMPORTERS[kind]()
+    importer.load_maps()
+    offset = read_checkpoint(path, kind) if resume else 0
+    records = 0
+    skipped = Counter()
+    size = os.path.getsize(path)
+    chunk = []
+    with open(path, 'rb') as stream, keep_dates(importer.model):
+        for record, end in read_records(stream, fmt, offset):
+            records += 1
+            try:
+                if not isinstance(record, dict):
+                    raise SkipRecord('неверная запись')
+                chunk.append(importer.build(record))
+            except SkipRecord as reason:
+                skipped[str(reason)] += 1
+            if len(chunk) < chunk_size:
+                continue
+            _save(importer, chunk, batch_size, skipped)
+            chunk.clear()
+            # Чекпойнт пишется после COMMIT: при падении между ними
+            # последняя транзакция повторится, а ignore_conflicts
+            # пропустит записи с уже существующими id.
+            write_checkpoint(path, kind, end)
+            if progress is not None:
+                progress(records, end, size)
+        _save(importer, chunk, batch_size, skipped)
+    if progress is not None:
+        progress(records, size, size)
+    if os.path.exists(checkpoint_path(path)):
+        os.remove(checkpoint_path(path))
+    return records, skipped
+
+
+def finish():
+    """
+    Пересчитывает то, что при обычном сохранении делают сигналы:
+    ленты подписок, счётчики, ссылки на картинки, количество постов
+    и поколения кэша.
+    """
+    feed.rebuild()
+    counters.repair()
+    media.repair()
+    cache.delete_many(
+        [count_cache_key('index')]
+        + [count_cache_key('group', pk)
+           for pk in Group.objects.values_list('pk', flat=True).iterator()])
+    bump_generation('posts')
+    bump_generation('comments')
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import FeedItem, Follow, Post
+
+
+def follow_path_queries(user_id, author_id, group_id):
+    """Запросы ленты, профиля, группы и подписок, которым нужны индексы."""
+    return {
+        'index': Post.objects.all(),
+        'group': Post.objects.filter(group_id=group_id),
+        'profile': Post.objects.filter(author_id=author_id),
+        'follow_index': Post.objects.filter(
+            feed_items__user_id=user_id).order_by('-feed_items__pub_date'),
+        'feed_page': FeedItem.objects.filter(
+            user_id=user_id).order_by('-pub_date'),
+        'is_following': Follow.objects.filter(
+            user_id=user_id, author_id=author_id),
+        'followers': Follow.objects.filter(author_id=author_id),
+    }
+
+
+class Command(BaseCommand):
+    help = ('Печатает план выполнения (EXPLAIN) запросов ленты, '
+            'профиля, группы и подписок, чтобы проверить, что они '
+            'используют индексы, а не полный просмотр таблицы.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, default=1)
+        parser.add_argument('--author', type=int, default=1)
+        parser.add_argument('--group', type=int, default=1)
+
+    def handle(self, *args, **options):
+        queries = follow_path_queries(
+            options['user'], options['author'], options['group'])
+        for name, queryset in queries.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(queryset.explain())
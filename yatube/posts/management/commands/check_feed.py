@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import feed
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = ('Сверяет материализованную ленту подписок '
+            'с живым соединением Follow и Post.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'usernames', nargs='*',
+            help='Пользователи для проверки. По умолчанию проверяются все.',
+        )
+        parser.add_argument(
+            '--fix', action='store_true',
+            help='Пересобрать ленту пользователей с расхождениями.',
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('pk')
+        if options['usernames']:
+            users = users.filter(username__in=options['usernames'])
+        broken = 0
+        for user in users.iterator():
+            missing, extra = feed.check(user)
+            if not missing and not extra:
+                continue
+            broken += 1
+            self.stdout.write(
+                f'{user.username}: нет в ленте {len(missing)}, '
+                f'лишних {len(extra)}')
+            if options['fix']:
+                feed.rebuild(user)
+        if broken and not options['fix']:
+            raise CommandError(f'Расхождения в лентах: {broken}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Проверка завершена, расхождений: {broken}'))
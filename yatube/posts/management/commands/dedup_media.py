@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from posts import media
+
+
+class Command(BaseCommand):
+    help = ('Переводит картинки постов на имена по содержимому: '
+            'дубликаты удаляются, посты ссылаются на общий файл. '
+            'Пересчитывает ссылки на файлы.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только посчитать, ничего не меняя.')
+        parser.add_argument('--delete-orphans', action='store_true',
+                            help='Удалить файлы, на которые не ссылается '
+                                 'ни один пост.')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        stats = media.dedup(dry_run=dry_run)
+        orphans, orphan_bytes = media.orphans(
+            delete=options['delete_orphans'] and not dry_run)
+        reclaimed = stats['reclaimed']
+        if options['delete_orphans']:
+            reclaimed += orphan_bytes
+        self.stdout.write(
+            f'Файлов: {stats["files"]}, дубликатов: {stats["duplicates"]}, '
+            f'нет на диске: {stats["missing"]}, '
+            f'без ссылок: {orphans} ({orphan_bytes} байт)')
+        self.stdout.write(self.style.SUCCESS(
+            f'{"Можно освободить" if dry_run else "Освобождено"}: '
+            f'{reclaimed} байт'))
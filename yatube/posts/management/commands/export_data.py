@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import exporter
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = ('Потоково выгружает посты или комментарии автора '
+            'в JSONL, CSV или zip с картинками.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('--kind', choices=exporter.KINDS,
+                            default='posts')
+        parser.add_argument('--format', choices=exporter.FORMATS,
+                            default='jsonl')
+        parser.add_argument('--output',
+                            help='Файл для выгрузки. По умолчанию stdout, '
+                                 'для zip файл обязателен.')
+
+    def handle(self, *args, **options):
+        try:
+            author = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(
+                f'Пользователь {options["username"]} не найден')
+        fmt = options['format']
+        if fmt == 'zip' and not options['output']:
+            raise CommandError('Для zip укажите --output')
+        chunks = exporter.stream(author, options['kind'], fmt)
+        if not options['output']:
+            for chunk in chunks:
+                self.stdout.write(chunk.decode(), ending='')
+            return
+        with open(options['output'], 'wb') as output:
+            for chunk in chunks:
+                output.write(chunk)
+        self.stderr.write(self.style.SUCCESS(
+            f'Выгрузка записана в {options["output"]}'))
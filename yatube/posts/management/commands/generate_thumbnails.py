@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Ставит в очередь задач генерацию вариантов для картинок, '
+            'у которых готовы не все варианты из POST_IMAGE_VARIANTS.')
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').exclude(image=None).only(
+            'image').order_by('pk')
+        scheduled = 0
+        for post in posts.iterator():
+            if any(thumbnails.missing(post.image, size)
+                   for size in settings.POST_IMAGE_VARIANTS):
+                thumbnails.schedule(post.pk)
+                scheduled += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Поставлено задач: {scheduled}'))
@@ -0,0 +1,60 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import importer
+
+
+class Command(BaseCommand):
+    help = ('Потоково импортирует группы, пользователей, посты, '
+            'комментарии или подписки из JSONL или CSV.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(importer.IMPORTERS))
+        parser.add_argument('paths', nargs='+')
+        parser.add_argument('--format', choices=importer.FORMATS,
+                            help='По умолчанию определяется '
+                                 'по расширению файла.')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Записей в одном bulk_create.')
+        parser.add_argument('--chunk-size', type=int, default=10000,
+                            help='Записей в одной транзакции.')
+        parser.add_argument('--resume', action='store_true',
+                            help='Продолжить с сохранённого чекпойнта.')
+        parser.add_argument('--no-rebuild', action='store_true',
+                            help='Не пересчитывать ленты, счётчики и кэш. '
+                                 'Удобно, если следом импортируются '
+                                 'другие файлы.')
+
+    def handle(self, *args, **options):
+        for path in options['paths']:
+            started = time.perf_counter()
+
+            def progress(records, offset, size):
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f'{path}: {records} записей, '
+                    f'{offset * 100 // max(size, 1)}%, '
+                    f'{records / max(elapsed, 1e-6):.0f} записей/с')
+
+            try:
+                records, skipped = importer.run(
+                    options['kind'], path,
+                    fmt=options['format'],
+                    batch_size=options['batch_size'],
+                    chunk_size=options['chunk_size'],
+                    resume=options['resume'],
+                    progress=progress,
+                )
+            except (OSError, ValueError) as error:
+                raise CommandError(f'{path}: {error}')
+            self.stdout.write(self.style.SUCCESS(
+                f'{path}: импортировано записей {records} за '
+                f'{time.perf_counter() - started:.1f} с'))
+            for reason, total in skipped.items():
+                self.stdout.write(self.style.WARNING(
+                    f'Пропущено ({reason}): {total}'))
+        if not options['no_rebuild']:
+            importer.finish()
+            self.stdout.write(self.style.SUCCESS(
+                'Ленты, счётчики и кэш пересчитаны'))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from core.cache import bump_generation
+from posts import images
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Нормализует картинки постов, загруженные до нормализации '
+            'при загрузке, и записывает их размеры и вес.')
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').exclude(image=None).filter(
+            image_bytes=None).only('image', 'updated').order_by('pk')
+        count = missing = before = after = 0
+        for post in posts.iterator():
+            try:
+                old, new = images.normalize_stored(post)
+            except OSError as error:
+                missing += 1
+                self.stderr.write(f'Пост {post.pk}: {error}')
+                continue
+            count += 1
+            before += old
+            after += new
+        if count:
+            bump_generation('posts')
+        self.stdout.write(self.style.SUCCESS(
+            f'Картинок: {count}, не удалось открыть: {missing}, '
+            f'было {before} байт, стало {after} байт'))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import feed
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает материализованную ленту подписок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'usernames', nargs='*',
+            help='Пользователи, для которых пересобрать ленту. '
+                 'По умолчанию пересобирается лента всех пользователей.',
+        )
+
+    def handle(self, *args, **options):
+        usernames = options['usernames']
+        if not usernames:
+            created = feed.rebuild()
+            self.stdout.write(self.style.SUCCESS(
+                f'Лента пересобрана, записей: {created}'))
+            return
+        for username in usernames:
+            try:
+                user = User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'Пользователь {username} не найден')
+            created = feed.rebuild(user)
+            self.stdout.write(self.style.SUCCESS(
+                f'Лента {username} пересобрана, записей: {created}'))
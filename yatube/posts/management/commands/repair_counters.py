@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from posts import counters, tasks
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает счётчики постов, комментариев '
+            'и подписок по живым данным.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--background', action='store_true',
+                            help='Поставить пересчёт в очередь задач.')
+
+    def handle(self, *args, **options):
+        if options['background']:
+            tasks.repair_counters.delay(options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(
+                'Пересчёт счётчиков поставлен в очередь'))
+            return
+        users, posts = counters.repair(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано пользователей: {users}, постов: {posts}'))
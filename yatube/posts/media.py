@@ -0,0 +1,249 @@
+"""
+Ссылки постов на файлы картинок.
+
+Хранилище posts.storage отдаёт одинаковым картинкам один файл, поэтому
+файл удаляется, только когда на него не ссылается ни один пост.
+Сигналы вызывают retain() для новой картинки поста и release() для
+старой, счётчик в StoredImage меняется F-выражением сразу после
+записи поста, но, так как ATOMIC_REQUESTS выключен, не в одной с ней
+транзакции. Файл и его миниатюры удаляет задача collect_image, если
+к её выполнению ссылок так и не появилось. Перед удалением collect()
+ещё раз проверяет живые данные, поэтому разошедшийся счётчик, например
+после bulk_create или падения между записью поста и сигналом, может
+только задержать удаление, но не удалить нужный файл.
+
+dedup() переводит файлы, загруженные до хранилища по содержимому,
+на имена по SHA-256: посты переходят на общий файл, дубликаты
+удаляются. Прежний файл удаляется только после того, как посты
+переведены, поэтому прерванную команду достаточно запустить снова.
+Им пользуется команда dedup_media.
+"""
+import os
+import shutil
+import tempfile
+from collections import Counter
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+from django.utils import dateformat
+from sorl.thumbnail import delete as delete_thumbnails
+from sorl.thumbnail.images import ImageFile
+
+from core.cache import bump_generation, drop_fragment
+from jobs.queue import enqueue
+
+from . import thumbnails
+from .models import Post, StoredImage
+from .storage import image_storage
+
+BATCH_SIZE = 500
+
+
+def name_of(value):
+    """Имя файла из значения поля image: строки, файла или None."""
+    return getattr(value, 'name', value) or ''
+
+
+def recount(names):
+    """Пересчитывает ссылки на файлы names по живым данным."""
+    names = [name for name in names if name]
+    counts = dict(
+        Post.objects.filter(image__in=names)
+        .order_by()
+        .values('image')
+        .annotate(total=Count('pk'))
+        .values_list('image', 'total')
+    )
+    for name in names:
+        total = counts.get(name, 0)
+        if not StoredImage.objects.filter(name=name).update(
+                ref_count=total):
+            StoredImage.objects.bulk_create(
+                [StoredImage(name=name, ref_count=total)],
+                ignore_conflicts=True)
+
+
+def retain(name):
+    if not name:
+        return
+    if not StoredImage.objects.filter(name=name).update(
+            ref_count=F('ref_count') + 1):
+        StoredImage.objects.bulk_create(
+            [StoredImage(name=name, ref_count=1)], ignore_conflicts=True)
+
+
+def release(name):
+    """Убирает ссылку на файл; файл без ссылок удалит фоновая задача."""
+    if not name:
+        return
+    StoredImage.objects.filter(name=name).update(
+        ref_count=Greatest(F('ref_count') - 1, 0))
+    enqueue('posts.tasks.collect_image', (name,))
+
+
+def collect(name):
+    """
+    Удаляет файл и его миниатюры, если на него никто не ссылается.
+    Счётчик сверяется с живыми данными: разошедшийся счётчик
+    пересчитывается, а файл остаётся. Файлы вне хранилища не трогаются.
+    """
+    try:
+        image_storage.path(name)
+    except SuspiciousFileOperation:
+        return False
+    with transaction.atomic():
+        if StoredImage.objects.filter(name=name, ref_count__gt=0).exists():
+            return False
+        if Post.objects.filter(image=name).exists():
+            recount((name,))
+            return False
+        StoredImage.objects.filter(name=name).delete()
+        delete_thumbnails(ImageFile(name, image_storage), delete_file=False)
+        image_storage.delete(name)
+    return True
+
+
+def repair():
+    """Пересчитывает все счётчики ссылок. Возвращает число файлов."""
+    with transaction.atomic():
+        StoredImage.objects.all().delete()
+        StoredImage.objects.bulk_create(
+            StoredImage(name=image, ref_count=total)
+            for image, total in Post.objects.exclude(image='')
+            .exclude(image=None)
+            .order_by()
+            .values('image')
+            .annotate(total=Count('pk'))
+            .values_list('image', 'total')
+            .iterator()
+        )
+        return StoredImage.objects.count()
+
+
+def move(name, stats, planned=None):
+    """
+    Кладёт копию файла name под имя по содержимому и возвращает это имя
+    или None, если файла нет. Сам файл остаётся до relink(), поэтому
+    прерванный перевод можно повторить. С planned ничего не меняет,
+    а только запоминает в нём новые имена.
+    """
+    dry_run = planned is not None
+    if not image_storage.exists(name):
+        stats['missing'] += 1
+        return None
+    size = image_storage.size(name)
+    with image_storage.open(name) as file:
+        hashed = image_storage.hashed_name(name, file)
+    stats['files'] += 1
+    if image_storage.exists(hashed) or hashed in (planned or ()):
+        stats['duplicates'] += 1
+        stats['reclaimed'] += size
+    elif dry_run:
+        planned.add(hashed)
+    else:
+        place(image_storage.path(name), image_storage.path(hashed))
+    return hashed
+
+
+def place(source, target):
+    """
+    Создаёт target с содержимым source. Файл появляется под новым
+    именем целиком, поэтому по имени по содержимому никогда не лежит
+    недописанная копия.
+    """
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    try:
+        os.link(source, target)
+        return
+    except FileExistsError:
+        return
+    except OSError:
+        pass
+    fd, temporary = tempfile.mkstemp(dir=os.path.dirname(target))
+    os.close(fd)
+    try:
+        shutil.copyfile(source, temporary)
+        os.replace(temporary, target)
+    except BaseException:
+        os.remove(temporary)
+        raise
+
+
+def discard(name):
+    """Удаляет прежний файл, если на него больше не ссылаются посты."""
+    if Post.objects.filter(image=name).exists():
+        return
+    # Миниатюры считались по имени в прежнем хранилище.
+    delete_thumbnails(ImageFile(name, default_storage), delete_file=False)
+    image_storage.delete(name)
+
+
+def relink(name, hashed):
+    """Переводит посты на новое имя файла и сбрасывает их карточки."""
+    with transaction.atomic():
+        posts = list(Post.objects.filter(image=name).values_list(
+            'pk', 'updated'))
+        Post.objects.filter(image=name).update(image=hashed)
+    for pk, updated in posts:
+        drop_fragment('post_card', pk, dateformat.format(updated, 'U.u'))
+    source = ImageFile(hashed, image_storage)
+    if posts and any(thumbnails.missing(source, size)
+                     for size in settings.POST_IMAGE_VARIANTS):
+        thumbnails.schedule(posts[0][0])
+
+
+def dedup(dry_run=False):
+    """
+    Переводит картинки постов на имена по содержимому.
+    Возвращает Counter: files, duplicates, reclaimed (байт), missing.
+    """
+    stats = Counter()
+    planned = set() if dry_run else None
+    names = (Post.objects.exclude(image='').exclude(image=None)
+             .order_by('image').values_list('image', flat=True).distinct())
+    last = ''
+    # Имена перебираются по возрастанию, а не одним курсором: посты
+    # переименовываются по ходу перебора.
+    while True:
+        batch = list(names.filter(image__gt=last)[:BATCH_SIZE])
+        if not batch:
+            break
+        last = batch[-1]
+        for name in batch:
+            if image_storage.is_hashed(name):
+                continue
+            hashed = move(name, stats, planned)
+            if hashed is not None and not dry_run:
+                relink(name, hashed)
+                discard(name)
+    if not dry_run:
+        repair()
+        bump_generation('posts')
+    return stats
+
+
+def orphans(delete=False):
+    """
+    Файлы в каталоге картинок, на которые не ссылается ни один пост.
+    Возвращает их число и размер в байтах.
+    """
+    directory = Post._meta.get_field('image').upload_to.rstrip('/')
+    root = image_storage.path(directory)
+    referenced = set(Post.objects.exclude(image='').exclude(image=None)
+                     .values_list('image', flat=True).iterator())
+    count = size = 0
+    for path, _, files in os.walk(root):
+        for filename in files:
+            full_path = os.path.join(path, filename)
+            name = os.path.relpath(full_path, image_storage.location)
+            if name.replace(os.sep, '/') in referenced:
+                continue
+            count += 1
+            size += os.path.getsize(full_path)
+            if delete:
+                collect(name.replace(os.sep, '/'))
+    return count, size
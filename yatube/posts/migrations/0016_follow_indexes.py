@@ -0,0 +1,56 @@
+# Generated by Django 2.2.16 on 2026-10-18 20:04
+
+from django.db import migrations, models
+
+BATCH_SIZE = 500
+
+
+def dedup_follows(apps, schema_editor):
+    """
+    Удаляет повторные подписки пачками, оставляя самую раннюю,
+    и пересчитывает счётчики затронутых пользователей.
+    """
+    Follow = apps.get_model('posts', 'Follow')
+    UserStats = apps.get_model('posts', 'UserStats')
+    extra, touched, previous = [], set(), None
+    rows = Follow.objects.order_by('user', 'author', 'pk').values_list(
+        'pk', 'user', 'author')
+    for pk, user_id, author_id in rows.iterator():
+        if (user_id, author_id) == previous:
+            extra.append(pk)
+            touched.update((user_id, author_id))
+        previous = (user_id, author_id)
+    for start in range(0, len(extra), BATCH_SIZE):
+        Follow.objects.filter(pk__in=extra[start:start + BATCH_SIZE]).delete()
+    for user_id in touched:
+        UserStats.objects.filter(user_id=user_id).update(
+            follower_count=Follow.objects.filter(author_id=user_id).count(),
+            following_count=Follow.objects.filter(user_id=user_id).count(),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(dedup_follows, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['author', 'user'], name='follow_author_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', '-pub_date'], name='post_author_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['group', '-pub_date'], name='post_group_pub_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique_follow'),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 2.2.16 on 2026-10-18 20:14
+
+from django.db import migrations, models
+from django.template.defaultfilters import linebreaks
+from django.utils.text import Truncator
+
+BATCH_SIZE = 500
+# POST_EXCERPT_LENGTH на момент миграции.
+EXCERPT_LENGTH = 500
+
+
+def render_text(text):
+    """Копия posts.models.render_text на момент миграции."""
+    excerpt = text
+    if len(text) > EXCERPT_LENGTH:
+        excerpt = Truncator(text).chars(EXCERPT_LENGTH)
+    return {
+        'text_html': linebreaks(text, autoescape=True),
+        'excerpt': excerpt,
+        'excerpt_html': linebreaks(excerpt, autoescape=True),
+    }
+
+
+def fill_rendered_text(apps, schema_editor):
+    """Рендерит текст и выдержку уже существующих постов пачками."""
+    Post = apps.get_model('posts', 'Post')
+    last_pk = 0
+    while True:
+        posts = list(Post.objects.filter(pk__gt=last_pk).order_by('pk')
+                     .only('text')[:BATCH_SIZE])
+        if not posts:
+            return
+        for post in posts:
+            for field, value in render_text(post.text).items():
+                setattr(post, field, value)
+        Post.objects.bulk_update(
+            posts, ('text_html', 'excerpt', 'excerpt_html'))
+        last_pk = posts[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_follow_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='excerpt',
+            field=models.TextField(default='', editable=False, verbose_name='Выдержка'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='excerpt_html',
+            field=models.TextField(default='', editable=False, verbose_name='Выдержка в HTML'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='text_html',
+            field=models.TextField(default='', editable=False, verbose_name='Текст в HTML'),
+        ),
+        migrations.RunPython(fill_rendered_text, migrations.RunPython.noop),
+    ]
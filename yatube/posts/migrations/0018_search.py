@@ -0,0 +1,96 @@
+from django.db import migrations
+
+# Схема поиска на момент миграции: posts.search со временем меняется,
+# а миграция должна создавать то, что было при её написании.
+# Триггеры потом ставит заново post_migrate.
+TABLE = 'posts_post_search'
+
+AUTHOR = "u.username || ' ' || u.first_name || ' ' || u.last_name"
+
+INDEX_POST = f'''
+    INSERT INTO {TABLE} (rowid, text, author, group_title)
+    SELECT NEW.id, NEW.text, {AUTHOR},
+           COALESCE((SELECT title FROM posts_group
+                     WHERE id = NEW.group_id), '')
+    FROM auth_user u WHERE u.id = NEW.author_id;
+'''
+
+SCHEMA = (
+    f'''CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5(
+        text, author, group_title,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )''',
+)
+
+TRIGGERS = {
+    f'{TABLE}_insert': f'''
+    AFTER INSERT ON posts_post BEGIN {INDEX_POST} END''',
+    f'{TABLE}_update': f'''
+    AFTER UPDATE OF text, author_id, group_id ON posts_post BEGIN
+        DELETE FROM {TABLE} WHERE rowid = OLD.id;
+        {INDEX_POST}
+    END''',
+    f'{TABLE}_delete': f'''
+    AFTER DELETE ON posts_post BEGIN
+        DELETE FROM {TABLE} WHERE rowid = OLD.id;
+    END''',
+    f'{TABLE}_author': f'''
+    AFTER UPDATE OF username, first_name, last_name ON auth_user BEGIN
+        UPDATE {TABLE}
+        SET author = (SELECT {AUTHOR} FROM auth_user u WHERE u.id = NEW.id)
+        WHERE rowid IN (SELECT id FROM posts_post WHERE author_id = NEW.id);
+    END''',
+    f'{TABLE}_group': f'''
+    AFTER UPDATE OF title ON posts_group BEGIN
+        UPDATE {TABLE} SET group_title = NEW.title
+        WHERE rowid IN (SELECT id FROM posts_post WHERE group_id = NEW.id);
+    END''',
+}
+
+REINDEX = f'''
+    INSERT INTO {TABLE} (rowid, text, author, group_title)
+    SELECT p.id, p.text, {AUTHOR}, COALESCE(g.title, '')
+    FROM posts_post p
+    JOIN auth_user u ON u.id = p.author_id
+    LEFT JOIN posts_group g ON g.id = p.group_id
+    WHERE p.id > %s AND p.id <= %s
+'''
+BATCH_SIZE = 1000
+
+
+def create_search_index(apps, schema_editor):
+    """Создаёт таблицу FTS5 с триггерами и индексирует посты."""
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for statement in SCHEMA:
+            cursor.execute(statement)
+        for name, body in TRIGGERS.items():
+            cursor.execute(f'CREATE TRIGGER IF NOT EXISTS {name} {body}')
+        cursor.execute(f'DELETE FROM {TABLE}')
+        cursor.execute('SELECT COALESCE(MAX(id), 0) FROM posts_post')
+        high = cursor.fetchone()[0]
+        for low in range(0, high, BATCH_SIZE):
+            cursor.execute(REINDEX, (low, low + BATCH_SIZE))
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name in TRIGGERS:
+            cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+        cursor.execute(f'DROP TABLE IF EXISTS {TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_rendered_text'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 2.2.16 on 2026-10-18 20:46
+
+from django.db import migrations, models
+
+
+# Триггеры поиска на момент миграции (posts.search.TRIGGERS).
+SEARCH_TRIGGERS = tuple(
+    f'posts_post_search_{name}'
+    for name in ('insert', 'update', 'delete', 'author', 'group'))
+
+
+def drop_search_triggers(apps, schema_editor):
+    """Триггеры поиска вернёт post_migrate после пересоздания posts_post."""
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name in SEARCH_TRIGGERS:
+            cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_search_triggers,
+                             migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='post',
+            name='image_bytes',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Размер картинки в байтах'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image_height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Высота картинки'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image_width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Ширина картинки'),
+        ),
+        migrations.RunPython(migrations.RunPython.noop,
+                             drop_search_triggers),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 2.2.16 on 2026-10-18 20:50
+
+from django.db import migrations, models
+
+import posts.storage
+
+
+# Триггеры поиска на момент миграции (posts.search.TRIGGERS).
+SEARCH_TRIGGERS = tuple(
+    f'posts_post_search_{name}'
+    for name in ('insert', 'update', 'delete', 'author', 'group'))
+
+
+def drop_search_triggers(apps, schema_editor):
+    """Триггеры поиска вернёт post_migrate после пересоздания posts_post."""
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name in SEARCH_TRIGGERS:
+            cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_image_dimensions'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_search_triggers,
+                             migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='StoredImage',
+            fields=[
+                ('name', models.CharField(max_length=100, primary_key=True, serialize=False, verbose_name='Файл')),
+                ('ref_count', models.PositiveIntegerField(default=0, verbose_name='Количество ссылок')),
+            ],
+            options={
+                'verbose_name': 'файл картинки',
+                'verbose_name_plural': 'файлы картинок',
+            },
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=posts.storage.ContentAddressedStorage(), upload_to='posts/', verbose_name='Картинка'),
+        ),
+        migrations.RunPython(migrations.RunPython.noop,
+                             drop_search_triggers),
+    ]
@@ -1,12 +1,29 @@
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.utils.html import linebreaks
+from django.utils.text import Truncator
 
 from core.models import CreatedModel
 
+from .storage import image_storage
+
 User = get_user_model()
 
 
+def render_text(text):
+    """HTML текста поста и короткая выдержка для карточек."""
+    excerpt = text
+    # Truncator проверяет каждый символ; короткий текст обрезать незачем.
+    if len(text) > settings.POST_EXCERPT_LENGTH:
+        excerpt = Truncator(text).chars(settings.POST_EXCERPT_LENGTH)
+    return {
+        'text_html': linebreaks(text, autoescape=True),
+        'excerpt': excerpt,
+        'excerpt_html': linebreaks(excerpt, autoescape=True),
+    }
+
+
 class Group(models.Model):
     """Модель для создания таблицы Group."""
 
@@ -24,6 +41,41 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    """Наборы полей и связей под конкретные страницы."""
+
+    # Что карточка поста читает у поста, автора и группы.
+    LISTING_FIELDS = (
+        'pub_date', 'updated', 'excerpt_html', 'image', 'comment_count',
+        'author', 'author__username', 'author__first_name',
+        'author__last_name', 'group', 'group__title', 'group__slug',
+    )
+
+    def for_listing(self):
+        """
+        Лента карточек: автор и группа одним JOIN, только нужные
+        карточке столбцы, вместо полного текста - выдержка.
+        Количество комментариев берётся из поддерживаемого
+        сигналами comment_count.
+        """
+        return self.select_related('author', 'group').only(
+            *self.LISTING_FIELDS)
+
+    def update(self, **kwargs):
+        """Массовая замена текста пересчитывает и его HTML."""
+        if isinstance(kwargs.get('text'), str):
+            kwargs.update(render_text(kwargs['text']))
+        return super().update(**kwargs)
+
+    def for_detail(self):
+        """Страница поста: счётчики автора, группа и комментарии с авторами."""
+        return self.select_related('author__stats', 'group').prefetch_related(
+            models.Prefetch(
+                'comments',
+                queryset=Comment.objects.select_related('author'),
+            ))
+
+
 class Post(CreatedModel):
     """Модель для создания таблицы Post."""
 
@@ -45,17 +97,77 @@ class Post(CreatedModel):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=image_storage,
+        blank=True,
+        null=True,
+    )
+    image_width = models.PositiveIntegerField(
+        verbose_name='Ширина картинки',
         blank=True,
         null=True,
+        editable=False,
+    )
+    image_height = models.PositiveIntegerField(
+        verbose_name='Высота картинки',
+        blank=True,
+        null=True,
+        editable=False,
+    )
+    image_bytes = models.PositiveIntegerField(
+        verbose_name='Размер картинки в байтах',
+        blank=True,
+        null=True,
+        editable=False,
+    )
+    comment_count = models.PositiveIntegerField(
+        verbose_name='Количество комментариев',
+        default=0,
+        editable=False,
+    )
+    text_html = models.TextField(
+        verbose_name='Текст в HTML',
+        default='',
+        editable=False,
+    )
+    excerpt = models.TextField(
+        verbose_name='Выдержка',
+        default='',
+        editable=False,
+    )
+    excerpt_html = models.TextField(
+        verbose_name='Выдержка в HTML',
+        default='',
+        editable=False,
     )
 
+    objects = PostQuerySet.as_manager()
+
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'пост'
         verbose_name_plural = 'посты'
+        indexes = (
+            models.Index(fields=('author', '-pub_date'),
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=('group', '-pub_date'),
+                         name='post_group_pub_date_idx'),
+        )
 
     def __str__(self):
-        return self.text[:settings.CHAR_NUMBER_FOR_ADMIN]
+        return (self.excerpt or self.text)[:settings.CHAR_NUMBER_FOR_ADMIN]
+
+    def render_text(self):
+        for field, value in render_text(self.text).items():
+            setattr(self, field, value)
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'text' in update_fields:
+            self.render_text()
+            if update_fields is not None:
+                kwargs['update_fields'] = {
+                    *update_fields, 'text_html', 'excerpt', 'excerpt_html'}
+        super().save(*args, **kwargs)
 
 
 class Comment(CreatedModel):
@@ -101,3 +213,83 @@ class Follow(models.Model):
     class Meta:
         verbose_name = 'подписка'
         verbose_name_plural = 'подписки'
+        constraints = (
+            models.UniqueConstraint(fields=('user', 'author'),
+                                    name='unique_follow'),
+        )
+        indexes = (
+            models.Index(fields=('author', 'user'),
+                         name='follow_author_user_idx'),
+        )
+
+
+class UserStats(models.Model):
+    """Счётчики пользователя, поддерживаемые сигналами."""
+
+    user = models.OneToOneField(User,
+                                on_delete=models.CASCADE,
+                                primary_key=True,
+                                related_name='stats',
+                                verbose_name='Пользователь')
+    post_count = models.PositiveIntegerField(
+        verbose_name='Количество постов', default=0)
+    follower_count = models.PositiveIntegerField(
+        verbose_name='Количество подписчиков', default=0)
+    following_count = models.PositiveIntegerField(
+        verbose_name='Количество подписок', default=0)
+
+    class Meta:
+        verbose_name = 'статистика пользователя'
+        verbose_name_plural = 'статистика пользователей'
+
+    def __str__(self):
+        return str(self.user)
+
+
+class StoredImage(models.Model):
+    """Сколько постов ссылаются на файл картинки, поддерживается сигналами."""
+
+    name = models.CharField(verbose_name='Файл',
+                            max_length=100,
+                            primary_key=True)
+    ref_count = models.PositiveIntegerField(
+        verbose_name='Количество ссылок', default=0)
+
+    class Meta:
+        verbose_name = 'файл картинки'
+        verbose_name_plural = 'файлы картинок'
+
+    def __str__(self):
+        return self.name
+
+
+class FeedItem(models.Model):
+    """Материализованная лента подписок: пост автора у подписчика."""
+
+    user = models.ForeignKey(User,
+                             on_delete=models.CASCADE,
+                             related_name='feed_items',
+                             verbose_name='Подписчик')
+    post = models.ForeignKey(Post,
+                             on_delete=models.CASCADE,
+                             related_name='feed_items',
+                             verbose_name='Пост')
+    author = models.ForeignKey(User,
+                               on_delete=models.CASCADE,
+                               related_name='+',
+                               verbose_name='Автор поста')
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        verbose_name = 'запись ленты'
+        verbose_name_plural = 'записи ленты'
+        constraints = (
+            models.UniqueConstraint(fields=('user', 'post'),
+                                    name='unique_feed_item'),
+        )
+        indexes = (
+            models.Index(fields=('user', '-pub_date'),
+                         name='feed_user_pub_date_idx'),
+            models.Index(fields=('user', 'author'),
+                         name='feed_user_author_idx'),
+        )
@@ -0,0 +1,214 @@
+"""
+Полнотекстовый поиск постов.
+
+На SQLite посты зеркалируются в виртуальную таблицу FTS5 TABLE:
+текст, имя автора и название группы. Таблицу поддерживают триггеры
+на posts_post, auth_user и posts_group, поэтому в индекс попадают и
+массовые изменения через update() и bulk_create(). Миграция создаёт
+таблицу, а post_migrate заново ставит триггеры: миграция, которая
+пересоздаёт таблицу posts_post, сначала удаляет их drop_triggers().
+Результаты ранжируются по bm25 и листаются курсором по (score, id).
+На других базах поиск идёт через icontains по тексту.
+"""
+import base64
+import json
+import re
+
+from django.db import connection, connections, router
+
+from .models import Post
+from .utils import NEXT, PREVIOUS, CursorPage, CursorPaginator
+
+TABLE = 'posts_post_search'
+
+# Вес совпадения в тексте, имени автора и названии группы для bm25.
+WEIGHTS = (1.0, 0.5, 0.5)
+
+AUTHOR = "u.username || ' ' || u.first_name || ' ' || u.last_name"
+
+INDEX_POST = f'''
+    INSERT INTO {TABLE} (rowid, text, author, group_title)
+    SELECT NEW.id, NEW.text, {AUTHOR},
+           COALESCE((SELECT title FROM posts_group
+                     WHERE id = NEW.group_id), '')
+    FROM auth_user u WHERE u.id = NEW.author_id;
+'''
+
+SCHEMA = (
+    f'''CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5(
+        text, author, group_title,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )''',
+)
+
+TRIGGERS = (
+    f'''CREATE TRIGGER IF NOT EXISTS {TABLE}_insert
+    AFTER INSERT ON posts_post BEGIN {INDEX_POST} END''',
+    f'''CREATE TRIGGER IF NOT EXISTS {TABLE}_update
+    AFTER UPDATE OF text, author_id, group_id ON posts_post BEGIN
+        DELETE FROM {TABLE} WHERE rowid = OLD.id;
+        {INDEX_POST}
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS {TABLE}_delete
+    AFTER DELETE ON posts_post BEGIN
+        DELETE FROM {TABLE} WHERE rowid = OLD.id;
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS {TABLE}_author
+    AFTER UPDATE OF username, first_name, last_name ON auth_user BEGIN
+        UPDATE {TABLE}
+        SET author = (SELECT {AUTHOR} FROM auth_user u WHERE u.id = NEW.id)
+        WHERE rowid IN (SELECT id FROM posts_post WHERE author_id = NEW.id);
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS {TABLE}_group
+    AFTER UPDATE OF title ON posts_group BEGIN
+        UPDATE {TABLE} SET group_title = NEW.title
+        WHERE rowid IN (SELECT id FROM posts_post WHERE group_id = NEW.id);
+    END''',
+)
+
+REINDEX = f'''
+    INSERT INTO {TABLE} (rowid, text, author, group_title)
+    SELECT p.id, p.text, {AUTHOR}, COALESCE(g.title, '')
+    FROM posts_post p
+    JOIN auth_user u ON u.id = p.author_id
+    LEFT JOIN posts_group g ON g.id = p.group_id
+    WHERE p.id > %s AND p.id <= %s
+'''
+
+
+def is_supported(using=connection):
+    return using.vendor == 'sqlite'
+
+
+def install(using=connection):
+    """Создаёт таблицу и триггеры, если их ещё нет."""
+    with using.cursor() as cursor:
+        for statement in (*SCHEMA, *TRIGGERS):
+            cursor.execute(statement)
+
+
+def drop_triggers(using=connection):
+    """
+    Удаляет триггеры. Миграция, пересоздающая posts_post, должна
+    сделать это заранее: триггеры на auth_user и posts_group ссылаются
+    на posts_post, и SQLite не даст переименовать новую таблицу.
+    """
+    with using.cursor() as cursor:
+        for statement in TRIGGERS:
+            name = statement.split()[5]
+            cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+
+
+def rebuild(batch_size=1000, using=connection):
+    """Заново индексирует все посты пачками по id. Возвращает их число."""
+    with using.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+        cursor.execute('SELECT COALESCE(MAX(id), 0) FROM posts_post')
+        high = cursor.fetchone()[0]
+        for low in range(0, high, batch_size):
+            cursor.execute(REINDEX, (low, low + batch_size))
+        cursor.execute(f'SELECT COUNT(*) FROM {TABLE}')
+        return cursor.fetchone()[0]
+
+
+def match_expression(words):
+    """
+    Слова запроса как выражение MATCH: каждое слово в кавычках, чтобы
+    операторы FTS5 в тексте не ломали запрос, последнее - по префиксу.
+    """
+    return ' '.join(f'"{word}"' for word in words) + '*'
+
+
+def filter_matching(queryset, query):
+    """
+    Оставляет в queryset постов только подходящие под запрос.
+    Условие добавляется через extra(): обёрнутый в RawSQL подзапрос
+    SQLite превращает в скалярный и берёт из него одну строку.
+    """
+    words = re.findall(r'\w+', query)
+    if not words:
+        return queryset
+    return queryset.extra(
+        where=[f'posts_post.id IN (SELECT rowid FROM {TABLE} '
+               f'WHERE {TABLE} MATCH %s)'],
+        params=[match_expression(words)],
+    )
+
+
+def encode_cursor(direction, score, pk):
+    raw = json.dumps([direction, score, pk])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        direction, score, pk = json.loads(
+            base64.urlsafe_b64decode(padded.encode()))
+        score, pk = float(score), int(pk)
+    except (TypeError, ValueError):
+        return None
+    if direction not in (NEXT, PREVIOUS):
+        return None
+    return direction, score, pk
+
+
+class SearchPaginator:
+    """Keyset-пагинация результатов поиска по (bm25 score, id)."""
+
+    def __init__(self, query, per_page):
+        self.words = re.findall(r'\w+', query)
+        self.per_page = int(per_page)
+
+    def get_page(self, cursor):
+        if not self.words:
+            return CursorPage([], cursor or '')
+        if not is_supported():
+            posts = Post.objects.for_listing()
+            for word in self.words:
+                posts = posts.filter(text__icontains=word)
+            return CursorPaginator(posts, self.per_page).get_page(cursor)
+        position = decode_cursor(cursor or '')
+        if position is None:
+            return self._page(NEXT, self._fetch(NEXT, None), '', first=True)
+        direction, score, pk = position
+        return self._page(direction, self._fetch(direction, (score, pk)),
+                          cursor)
+
+    def _fetch(self, direction, position):
+        compare, order = ('>', 'ASC') if direction == NEXT else ('<', 'DESC')
+        weights = ', '.join(str(weight) for weight in WEIGHTS)
+        sql = (f'SELECT id, score FROM ('
+               f'SELECT rowid AS id, bm25({TABLE}, {weights}) AS score '
+               f'FROM {TABLE} WHERE {TABLE} MATCH %s)')
+        params = [match_expression(self.words)]
+        if position is not None:
+            sql += (f' WHERE score {compare} %s '
+                    f'OR (score = %s AND id {compare} %s)')
+            params += [position[0], position[0], position[1]]
+        sql += f' ORDER BY score {order}, id {order} LIMIT %s'
+        params.append(self.per_page + 1)
+        with connections[router.db_for_read(Post)].cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    def _page(self, direction, rows, cursor, first=False):
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == PREVIOUS:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, not first
+        if not rows:
+            return CursorPage([], cursor)
+        posts = Post.objects.for_listing().in_bulk([pk for pk, _ in rows])
+        (first_pk, first_score), (last_pk, last_score) = rows[0], rows[-1]
+        return CursorPage(
+            [posts[pk] for pk, _ in rows if pk in posts],
+            cursor,
+            next_cursor=(encode_cursor(NEXT, last_score, last_pk)
+                         if has_next else None),
+            previous_cursor=(encode_cursor(PREVIOUS, first_score, first_pk)
+                             if has_previous else None),
+        )
@@ -0,0 +1,184 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import DEFERRED
+from django.db.models.signals import (post_delete, post_init, post_migrate,
+                                      post_save, pre_delete, pre_save)
+from django.dispatch import receiver
+
+from core.cache import bump_generation, drop_fragment
+
+from . import counters, feed, media, search, tasks
+from .models import Comment, Follow, Group, Post, User, UserStats
+from .utils import count_cache_key, profile_namespace
+
+NAME_FIELDS = ('username', 'first_name', 'last_name')
+
+
+def reset_post_counts(post):
+    """
+    Сбрасывает закэшированное количество постов в затронутых лентах,
+    в том числе в группе, из которой пост перенесли.
+    """
+    groups = {post.group_id, post._saved_group_id} - {DEFERRED, None}
+    post._saved_group_id = post.group_id
+    cache.delete_many([
+        count_cache_key('index'),
+        *(count_cache_key('group', pk) for pk in groups),
+        count_cache_key('profile', post.author_id),
+    ])
+
+
+@receiver(post_init, sender=Post)
+def remember_group(sender, instance, **kwargs):
+    """Запоминает группу из базы, чтобы сбросить и её счётчик."""
+    instance._saved_group_id = instance.__dict__.get('group_id', DEFERRED)
+
+
+@receiver(post_init, sender=Post)
+def remember_image(sender, instance, **kwargs):
+    """
+    Запоминает картинку, загруженную из базы, чтобы при сохранении
+    убрать ссылку на прежний файл. Отложенное поле не читается.
+    """
+    value = instance.__dict__.get('image', DEFERRED)
+    instance._saved_image = (media.name_of(value)
+                             if value is None or isinstance(value, str)
+                             else DEFERRED)
+
+
+@receiver(pre_save, sender=Post)
+@receiver(pre_delete, sender=Post)
+def load_saved_image(sender, instance, update_fields=None, **kwargs):
+    """Картинку, которую не загружали, берём из базы перед записью."""
+    if (instance._saved_image is DEFERRED and not instance._state.adding
+            and (update_fields is None or 'image' in update_fields)):
+        instance._saved_image = media.name_of(
+            Post.objects.filter(pk=instance.pk).values_list(
+                'image', flat=True).first())
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    """
+    Новый пост попадает в ленты подписчиков автора, у автора
+    с большим числом подписчиков - фоновой задачей.
+    """
+    if created:
+        if not feed.fan_out_post(
+                instance, limit=settings.FEED_FANOUT_INLINE_LIMIT):
+            tasks.fan_out_post.delay(instance.pk)
+        counters.change_user_stats(instance.author_id, 1, 'post_count')
+    image_saved(instance, created)
+    reset_post_counts(instance)
+    bump_generation('posts', modified=instance.updated)
+
+
+def image_saved(post, created):
+    if 'image' not in post.__dict__:
+        return
+    name = media.name_of(post.image)
+    if created:
+        media.retain(name)
+    elif post._saved_image is not DEFERRED and name != post._saved_image:
+        media.retain(name)
+        media.release(post._saved_image)
+    post._saved_image = name
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.change_user_stats(instance.author_id, -1, 'post_count')
+    media.release(instance._saved_image)
+    reset_post_counts(instance)
+    bump_generation('posts')
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    """Карточки постов выводят ссылку на группу."""
+    drop_fragment('group_header', instance.pk)
+    bump_generation('posts')
+
+
+@receiver(post_init, sender=User)
+def remember_name(sender, instance, **kwargs):
+    """Запоминает имя из базы, чтобы при сохранении сравнить с ним."""
+    instance._saved_name = user_name(instance)
+
+
+def user_name(user):
+    return tuple(user.__dict__.get(field, DEFERRED) for field in NAME_FIELDS)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    """
+    Имя и ссылка на автора закэшированы в карточках постов, а через
+    них - в лентах и страницах для гостей. Кэш сбрасывается, только
+    если имя изменилось.
+    """
+    name, saved = user_name(instance), instance._saved_name
+    instance._saved_name = name
+    if created:
+        UserStats.objects.get_or_create(user=instance)
+        return
+    if all(new is DEFERRED or new == old for new, old in zip(name, saved)):
+        return
+    drop_fragment('author_link', instance.pk)
+    bump_generation('posts')
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.change_comment_count(instance.post_id, 1)
+    bump_generation('comments', modified=instance.updated)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.change_comment_count(instance.post_id, -1)
+    bump_generation('comments')
+
+
+@receiver(post_save, sender=Follow)
+def follow_backfill(sender, instance, created, **kwargs):
+    """
+    Подписка наполняет ленту постами автора. Счётчики подписок
+    выводятся в закэшированных профилях обоих пользователей.
+    """
+    if created:
+        feed.backfill_follow(instance)
+        counters.change_user_stats(instance.author_id, 1, 'follower_count')
+        counters.change_user_stats(instance.user_id, 1, 'following_count')
+        bump_profiles(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_prune(sender, instance, **kwargs):
+    """Отписка убирает посты автора из ленты."""
+    feed.prune_follow(instance)
+    counters.change_user_stats(instance.author_id, -1, 'follower_count')
+    counters.change_user_stats(instance.user_id, -1, 'following_count')
+    bump_profiles(instance)
+
+
+def bump_profiles(follow):
+    """Сбрасывает кэш профилей подписчика и автора."""
+    for user in (follow.user, follow.author):
+        bump_generation(profile_namespace(user.username))
+
+
+@receiver(post_migrate)
+def install_search(sender, using, **kwargs):
+    """
+    Возвращает триггеры поиска, если миграция пересоздала posts_post:
+    SQLite удаляет триггеры вместе со старой таблицей.
+    """
+    connection = connections[using]
+    if (sender.name != 'posts' or not search.is_supported(connection)
+            or search.TABLE not in connection.introspection.table_names()):
+        return
+    search.install(connection)
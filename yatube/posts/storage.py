@@ -0,0 +1,45 @@
+"""
+Хранилище картинок постов с адресацией по содержимому.
+
+Файл называется по SHA-256 своего содержимого: posts/ab/abcd….jpg.
+Одинаковые картинки, загруженные заново, получают то же имя и на диск
+не пишутся, а миниатюры sorl-thumbnail, которые считаются по имени
+исходника, у дубликатов общие. Поэтому удалять файл вместе с постом
+нельзя: сколько постов ссылаются на файл, считает posts.media.
+"""
+import hashlib
+import posixpath
+import re
+
+from django.core.files.storage import FileSystemStorage
+
+HASHED_NAME = re.compile(r'(^|/)([0-9a-f]{2})/\2[0-9a-f]{62}(\.\w+)?$')
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def hashed_name(self, name, content):
+        """Имя файла по содержимому в каталоге name."""
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        directory = posixpath.dirname(name)
+        extension = posixpath.splitext(name)[1].lower()
+        digest = digest.hexdigest()
+        return posixpath.join(directory, digest[:2], digest + extension)
+
+    def is_hashed(self, name):
+        return bool(HASHED_NAME.search(name))
+
+    def _save(self, name, content):
+        hashed = self.hashed_name(name, content)
+        if self.exists(hashed):
+            return hashed
+        saved = super()._save(hashed, content)
+        if saved != hashed:
+            # Тот же файл одновременно записал другой запрос.
+            self.delete(saved)
+        return hashed
+
+
+image_storage = ContentAddressedStorage()
@@ -0,0 +1,30 @@
+"""Фоновые задачи приложения posts, их выполняет runworker."""
+from jobs.queue import task
+
+from . import counters, feed, media, thumbnails
+from .models import Post
+
+
+@task(priority=5)
+def generate_thumbnails(post_id):
+    thumbnails.generate(post_id)
+
+
+@task()
+def fan_out_post(post_id):
+    """Раскладывает пост автора с большим числом подписчиков по лентам."""
+    post = Post.objects.filter(pk=post_id).only(
+        'author', 'pub_date').first()
+    if post is not None:
+        feed.fan_out_post(post)
+
+
+@task(priority=-5)
+def repair_counters(batch_size=500):
+    counters.repair(batch_size)
+
+
+@task(priority=-5)
+def collect_image(name):
+    """Удаляет файл картинки, на который больше не ссылаются посты."""
+    media.collect(name)
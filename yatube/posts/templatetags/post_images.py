@@ -0,0 +1,20 @@
+from django import template
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_picture(post, size='card'):
+    """
+    Варианты картинки поста для <picture> из POST_IMAGE_VARIANTS.
+    Картинка в запросе не уменьшается: пока задача generate_thumbnails
+    не выполнена, возвращается заглушка тех же размеров.
+
+        {% post_picture post "card" as picture %}
+    """
+    if not post.image:
+        return None
+    return (thumbnails.cached(post.image, size)
+            or thumbnails.placeholder(size))
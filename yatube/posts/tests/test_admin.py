@@ -0,0 +1,65 @@
+from http import HTTPStatus
+
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User
+
+
+class AdminChangeListTest(TestCase):
+    """
+    Списки в админке не делают запрос на строку: иначе
+    QueryBudgetMiddleware в тестах поднимает QueryBudgetExceeded.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin')
+        for number in range(10):
+            author = User.objects.create_user(username=f'user{number}')
+            group = Group.objects.create(title=f'Группа {number}',
+                                         slug=f'group-{number}')
+            post = Post.objects.create(text=f'Пост {number}',
+                                       author=author, group=group)
+            Comment.objects.create(post=post, author=cls.admin,
+                                   text='Комментарий')
+            Follow.objects.create(user=cls.admin, author=author)
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def test_changelists(self):
+        for model in ('post', 'comment', 'follow', 'group'):
+            with self.subTest(model=model):
+                response = self.client.get(
+                    reverse(f'admin:posts_{model}_changelist'))
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_post_changelist(self):
+        """
+        Группа в list_editable выбирается автодополнением: в каждой
+        строке только пустой и выбранный вариант, а не все группы.
+        """
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'),
+            {'q': 'Пост',
+             'pub_date__year': Post.objects.first().pub_date.year},
+        )
+        self.assertEqual(response.context['cl'].result_count, 10)
+        self.assertContains(response, '>Группа 1</option>', count=1)
+
+    def test_post_changelist_skips_full_text(self):
+        """Список постов показывает выдержку и не читает полный текст."""
+        post = Post.objects.create(text='Начало ' + 'длинный текст ' * 100,
+                                   author=self.admin)
+        response = self.client.get(reverse('admin:posts_post_changelist'))
+        row = next(row for row in response.context['cl'].result_list
+                   if row.pk == post.pk)
+        self.assertTrue({'text', 'text_html'} <= row.get_deferred_fields())
+        self.assertContains(response, post.excerpt)
+        self.assertNotContains(response, post.text)
+        response = self.client.get(
+            reverse('admin:posts_post_change', args=(post.pk,)))
+        self.assertContains(response, post.text)
@@ -0,0 +1,84 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from core.cache import get_generation
+
+from ..models import Comment, Follow, Post, User, UserStats
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.follower = User.objects.create_user(username='follower')
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(
+            text='Пробный текст',
+            author=cls.author,
+        )
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_post_count(self):
+        """Создание и удаление поста меняют счётчик автора."""
+        self.assertEqual(self.stats(self.author).post_count, 1)
+        post = Post.objects.create(text='Второй', author=self.author)
+        self.assertEqual(self.stats(self.author).post_count, 2)
+        post.delete()
+        self.assertEqual(self.stats(self.author).post_count, 1)
+
+    def test_comment_count(self):
+        """Комментарии считаются в самом посте."""
+        comment = Comment.objects.create(
+            post=self.post, author=self.follower, text='Комментарий')
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+        comment.delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 0)
+
+    def test_follow_counts(self):
+        """Подписка меняет счётчики обоих пользователей."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        self.assertEqual(self.stats(self.author).follower_count, 1)
+        self.assertEqual(self.stats(self.follower).following_count, 1)
+        Follow.objects.all().delete()
+        self.assertEqual(self.stats(self.author).follower_count, 0)
+        self.assertEqual(self.stats(self.follower).following_count, 0)
+
+    def test_follow_count_on_cached_profile(self):
+        """
+        Профиль из кэша для гостя показывает новое число подписчиков,
+        а остальные ленты подписка не сбрасывает.
+        """
+        cache.clear()
+        url = reverse('posts:profile', args=(self.author.username,))
+        follower_url = reverse('posts:profile',
+                               args=(self.follower.username,))
+        self.assertContains(self.client.get(url), 'Подписчиков: 0')
+        self.assertContains(self.client.get(follower_url), 'подписок: 0')
+        generation = get_generation('posts')
+        follow = Follow.objects.create(user=self.follower, author=self.author)
+        self.assertContains(self.client.get(url), 'Подписчиков: 1')
+        self.assertContains(self.client.get(follower_url), 'подписок: 1')
+        follow.delete()
+        self.assertContains(self.client.get(url), 'Подписчиков: 0')
+        self.assertEqual(get_generation('posts'), generation)
+
+    def test_repair_counters(self):
+        """Команда repair_counters восстанавливает испорченные счётчики."""
+        Comment.objects.create(
+            post=self.post, author=self.follower, text='Комментарий')
+        UserStats.objects.filter(user=self.author).update(post_count=7)
+        UserStats.objects.filter(user=self.follower).delete()
+        Post.objects.update(comment_count=0)
+        call_command('repair_counters', '--batch-size=1', stdout=StringIO())
+        self.assertEqual(self.stats(self.author).post_count, 1)
+        self.assertEqual(self.stats(self.follower).post_count, 0)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
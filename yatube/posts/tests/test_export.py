@@ -0,0 +1,128 @@
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from http import HTTPStatus
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Comment, Group, Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ExportTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(slug='cats', title='Коты')
+        cls.post = Post.objects.create(
+            author=cls.author,
+            group=cls.group,
+            text='Пост, с "кавычками"',
+            image=SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif'),
+        )
+        Post.objects.create(author=cls.other, text='Чужой пост')
+        Comment.objects.create(post=cls.post, author=cls.author,
+                               text='Свой комментарий')
+        cls.url = reverse('posts:profile_export', args=(cls.author.username,))
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client.force_login(self.author)
+
+    def test_jsonl(self):
+        """Выгрузка в JSONL отдаётся потоком и содержит только автора."""
+        response = self.client.get(self.url)
+        self.assertTrue(response.streaming)
+        self.assertIn('author-posts.jsonl', response['Content-Disposition'])
+        records = [json.loads(line) for line in
+                   b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0]['text'], self.post.text)
+        self.assertEqual(records[0]['group'], 'cats')
+        self.assertEqual(records[0]['image'], self.post.image.name)
+
+    def test_csv_comments(self):
+        response = self.client.get(self.url,
+                                   {'kind': 'comments', 'format': 'csv'})
+        rows = list(csv.DictReader(io.StringIO(
+            b''.join(response.streaming_content).decode())))
+        self.assertEqual(rows, [{
+            'id': str(Comment.objects.get().pk),
+            'post': str(self.post.pk),
+            'author': 'author',
+            'text': 'Свой комментарий',
+            'pub_date': Comment.objects.get().pub_date.isoformat(),
+        }])
+
+    def test_zip(self):
+        """В архиве обе выгрузки и картинки постов."""
+        response = self.client.get(self.url, {'format': 'zip'})
+        archive = zipfile.ZipFile(
+            io.BytesIO(b''.join(response.streaming_content)))
+        self.assertIsNone(archive.testzip())
+        self.assertEqual(
+            sorted(archive.namelist()),
+            ['comments.jsonl', 'posts.jsonl', self.post.image.name])
+        self.assertEqual(archive.read(self.post.image.name), SMALL_GIF)
+
+    def test_zip_skips_bad_image_names(self):
+        """Отсутствующие и недопустимые картинки в архив не попадают."""
+        for name in ('posts/missing.gif', '../outside.gif', '/etc/passwd'):
+            Post.objects.create(author=self.author, text='Импортированный',
+                                image=name)
+        response = self.client.get(self.url, {'format': 'zip'})
+        archive = zipfile.ZipFile(
+            io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(
+            sorted(archive.namelist()),
+            ['comments.jsonl', 'posts.jsonl', self.post.image.name])
+
+    def test_access(self):
+        """Выгрузить чужие данные может только персонал."""
+        self.client.force_login(self.other)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+        self.other.is_staff = True
+        self.other.save()
+        self.assertEqual(self.client.get(self.url).status_code,
+                         HTTPStatus.OK)
+        self.assertEqual(
+            self.client.get(self.url, {'format': 'xml'}).status_code,
+            HTTPStatus.NOT_FOUND)
+
+    def test_export_command_round_trip(self):
+        """Выгрузку команды export_data читает import_data."""
+        output = io.StringIO()
+        call_command('export_data', 'author', stdout=output)
+        path = os.path.join(TEMP_MEDIA_ROOT, 'export.jsonl')
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(output.getvalue().replace(
+                f'"id": {self.post.pk}', '"id": 1000'))
+        call_command('import_data', 'posts', path, '--no-rebuild',
+                     stdout=io.StringIO())
+        self.assertEqual(Post.objects.get(pk=1000).text, self.post.text)
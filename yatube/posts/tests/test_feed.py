@@ -0,0 +1,48 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from .. import feed
+from ..models import FeedItem, Follow, Post, User
+
+
+class FeedTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.follower = User.objects.create_user(username='follower')
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(
+            text='Пробный текст',
+            author=cls.author,
+        )
+
+    def test_follow_backfills_feed(self):
+        """Подписка добавляет в ленту уже опубликованные посты."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        self.assertTrue(FeedItem.objects.filter(
+            user=self.follower, post=self.post).exists())
+
+    def test_new_post_fans_out(self):
+        """Новый пост попадает в ленту подписчика."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        new_post = Post.objects.create(text='Новый', author=self.author)
+        self.assertTrue(FeedItem.objects.filter(
+            user=self.follower, post=new_post).exists())
+
+    def test_unfollow_prunes_feed(self):
+        """Отписка убирает посты автора из ленты."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        Follow.objects.filter(user=self.follower,
+                              author=self.author).delete()
+        self.assertFalse(FeedItem.objects.filter(
+            user=self.follower).exists())
+
+    def test_check_and_rebuild(self):
+        """Проверка находит расхождения, пересборка их устраняет."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        FeedItem.objects.all().delete()
+        self.assertEqual(feed.check(self.follower), ({self.post.pk}, set()))
+        call_command('check_feed', '--fix', stdout=StringIO())
+        self.assertEqual(feed.check(self.follower), (set(), set()))
@@ -0,0 +1,128 @@
+import io
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from jobs.models import Job
+
+from .. import media
+from ..models import Post, StoredImage, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+# Тег EXIF Orientation: 6 - снято с поворотом на 90° по часовой.
+ORIENTATION = 0x0112
+
+
+def image_file(name, size, format_, orientation=None):
+    image = Image.new('RGB', size, 'red')
+    options = {}
+    if format_ == 'MPO':
+        options.update(save_all=True,
+                       append_images=[Image.new('RGB', size, 'blue')])
+    if orientation is not None:
+        exif = Image.Exif()
+        exif[ORIENTATION] = orientation
+        options['exif'] = exif.tobytes()
+    buffer = io.BytesIO()
+    image.save(buffer, format_, **options)
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT,
+                   POST_IMAGE_MAX_SIZE=(300, 300))
+class ImageNormalizationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def upload(self, image):
+        self.client.post(reverse('posts:post_create'),
+                         {'text': 'Пост с картинкой', 'image': image})
+        return Post.objects.get(text='Пост с картинкой')
+
+    def test_large_photo_is_rotated_shrunk_and_stripped(self):
+        """Фото поворачивается по EXIF, уменьшается и теряет EXIF."""
+        post = self.upload(image_file('photo.jpg', (900, 300), 'JPEG', 6))
+        self.assertEqual((post.image_width, post.image_height), (100, 300))
+        self.assertEqual(post.image_bytes, post.image.size)
+        with Image.open(post.image.path) as stored:
+            self.assertEqual(stored.format, 'JPEG')
+            self.assertEqual(stored.size, (100, 300))
+            self.assertFalse(stored.getexif())
+
+    def test_multi_frame_jpeg_is_normalized(self):
+        """От MPO с телефона остаётся первый кадр, повёрнутый и без EXIF."""
+        post = self.upload(image_file('photo.jpg', (900, 300), 'MPO', 6))
+        self.assertEqual((post.image_width, post.image_height), (100, 300))
+        with Image.open(post.image.path) as stored:
+            self.assertEqual(stored.format, 'JPEG')
+            self.assertFalse(stored.getexif())
+            red, _, blue = stored.getpixel((50, 150))
+            self.assertGreater(red, blue)
+
+    def test_small_image_is_not_enlarged(self):
+        """Маленькая картинка сохраняет размеры и не становится тяжелее."""
+        upload = image_file('small.png', (50, 40), 'PNG')
+        size = upload.size
+        post = self.upload(upload)
+        self.assertEqual((post.image_width, post.image_height), (50, 40))
+        self.assertLessEqual(post.image_bytes, size)
+        self.assertEqual(post.image_bytes, post.image.size)
+        self.assertTrue(post.image.name.endswith('.png'))
+
+    def test_unsupported_format_is_converted(self):
+        post = self.upload(image_file('scan.bmp', (50, 40), 'BMP'))
+        self.assertTrue(post.image.name.endswith('.jpg'))
+        with Image.open(post.image.path) as stored:
+            self.assertEqual(stored.format, 'JPEG')
+
+    def test_cleared_image_resets_dimensions(self):
+        post = self.upload(image_file('small.png', (50, 40), 'PNG'))
+        self.client.post(reverse('posts:post_edit', args=(post.pk,)),
+                         {'text': post.text, 'image-clear': 'on'})
+        post.refresh_from_db()
+        self.assertFalse(post.image)
+        self.assertIsNone(post.image_width)
+        self.assertIsNone(post.image_bytes)
+
+    def test_normalize_images_command(self):
+        """Команда нормализует старые картинки и отпускает исходники."""
+        post = Post.objects.create(
+            author=self.user, text='Старый пост',
+            image=image_file('old.jpg', (600, 600), 'JPEG', 3))
+        old_name = post.image.name
+        call_command('normalize_images', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual((post.image_width, post.image_height), (300, 300))
+        self.assertEqual(post.image_bytes, post.image.size)
+        self.assertNotEqual(post.image.name, old_name)
+        self.assertEqual(
+            StoredImage.objects.get(name=post.image.name).ref_count, 1)
+        self.assertEqual(StoredImage.objects.get(name=old_name).ref_count, 0)
+        self.assertTrue(media.collect(old_name))
+        self.assertFalse(post.image.storage.exists(old_name))
+        self.assertTrue(
+            Job.objects.filter(name='posts.tasks.generate_thumbnails'))
+
+        out = StringIO()
+        call_command('normalize_images', stdout=out)
+        self.assertIn('Картинок: 0', out.getvalue())
@@ -0,0 +1,128 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from .. import importer
+from ..models import Comment, FeedItem, Follow, Group, Post, User, UserStats
+
+
+class ImportDataTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, True)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def jsonl(self, name, records):
+        return self.write(name, ''.join(
+            json.dumps(record, ensure_ascii=False) + '\n'
+            for record in records))
+
+    def call(self, *args):
+        call_command('import_data', *args, stdout=StringIO())
+
+    def test_import_all_kinds(self):
+        """Импорт по очереди создаёт объекты и производные данные."""
+        self.call('groups', self.write(
+            'groups.csv', 'slug,title,description\ncats,Коты,Про котов\n'))
+        self.call('users', self.jsonl('users.jsonl', [
+            {'username': 'author', 'first_name': 'Лев'},
+            {'username': 'reader'},
+        ]))
+        self.call('posts', self.jsonl('posts.jsonl', [
+            {'id': 100, 'author': 'author', 'group': 'cats',
+             'text': 'Первый <b>пост</b>',
+             'pub_date': '2020-01-02T03:04:05+00:00'},
+            {'id': 101, 'author': 'nobody', 'text': 'Без автора'},
+        ]))
+        self.call('follows', self.jsonl('follows.jsonl', [
+            {'user': 'reader', 'author': 'author'},
+        ]))
+        self.call('comments', self.write(
+            'comments.csv',
+            'post,author,text\n100,reader,"Многострочный\nкомментарий"\n'
+            '999,reader,К несуществующему посту\n'))
+
+        post = Post.objects.get(pk=100)
+        self.assertEqual(post.group.slug, 'cats')
+        self.assertEqual(post.pub_date.year, 2020)
+        self.assertIn('&lt;b&gt;', post.text_html)
+        self.assertEqual(post.comment_count, 1)
+        self.assertFalse(Post.objects.filter(pk=101).exists())
+        self.assertEqual(Comment.objects.get().text,
+                         'Многострочный\nкомментарий')
+        self.assertFalse(User.objects.get(
+            username='reader').has_usable_password())
+        self.assertTrue(Follow.objects.filter(
+            user__username='reader', author__username='author').exists())
+        self.assertTrue(FeedItem.objects.filter(post=post).exists())
+        self.assertEqual(
+            UserStats.objects.get(user__username='author').post_count, 1)
+        self.assertEqual(Group.objects.get().title, 'Коты')
+
+    def test_resume_from_checkpoint(self):
+        """С --resume импорт продолжается со смещения из чекпойнта."""
+        User.objects.create_user(username='author')
+        lines = [json.dumps({'author': 'author', 'text': f'Пост {number}'})
+                 + '\n' for number in range(4)]
+        path = self.write('posts.jsonl', ''.join(lines))
+        importer.write_checkpoint(
+            path, 'posts', len(''.join(lines[:3]).encode()))
+        self.call('posts', path, '--resume', '--no-rebuild')
+        self.assertEqual(list(Post.objects.values_list('text', flat=True)),
+                         ['Пост 3'])
+        self.assertFalse(os.path.exists(importer.checkpoint_path(path)))
+
+    def test_chunks_write_checkpoints(self):
+        """После каждой транзакции смещение сохраняется в чекпойнт."""
+        User.objects.create_user(username='author')
+        path = self.jsonl('posts.jsonl', [
+            {'author': 'author', 'text': f'Пост {number}'}
+            for number in range(5)])
+        calls = []
+
+        def progress(records, offset, size):
+            calls.append((records, offset,
+                          importer.read_checkpoint(path, 'posts')))
+
+        records, skipped = importer.run(
+            'posts', path, batch_size=1, chunk_size=2, progress=progress)
+        self.assertEqual(records, 5)
+        self.assertFalse(skipped)
+        self.assertEqual([call[0] for call in calls], [2, 4, 5])
+        for _, offset, checkpoint in calls[:-1]:
+            self.assertEqual(checkpoint, offset)
+        self.assertEqual(calls[-1][1], os.path.getsize(path))
+        self.assertEqual(Post.objects.count(), 5)
+
+    def test_wrong_types_are_skipped(self):
+        """Записи с полями неверного типа пропускаются с причиной."""
+        User.objects.create_user(username='author')
+        path = self.jsonl('posts.jsonl', [
+            {'author': 'author', 'text': 'Пост', 'pub_date': 20200101},
+            {'author': 'author', 'text': ['Пост']},
+            {'author': ['author'], 'text': 'Пост'},
+            {'author': 'author', 'text': 'Пост', 'id': 1.5},
+            {'author': 'author', 'text': 'Пост', 'group': {}},
+            {'author': 'author', 'text': 'Годный пост'},
+        ])
+        records, skipped = importer.run('posts', path)
+        self.assertEqual(records, 6)
+        self.assertEqual(skipped, {
+            'неверное поле pub_date': 1,
+            'неверное поле text': 1,
+            'неверное поле author': 1,
+            'неверное поле id': 1,
+            'неверное поле group': 1,
+        })
+        self.assertEqual(list(Post.objects.values_list('text', flat=True)),
+                         ['Годный пост'])
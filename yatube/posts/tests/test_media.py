@@ -0,0 +1,139 @@
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from jobs import queue
+from jobs.models import Job
+
+from .. import media, thumbnails
+from ..models import Post, StoredImage, User
+from ..storage import image_storage
+from .test_thumbnails import OTHER_GIF, SMALL_GIF
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ContentAddressedStorageTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='author')
+
+    def create_post(self, content=SMALL_GIF, name='meme.gif'):
+        return Post.objects.create(
+            author=self.user, text='Мем',
+            image=SimpleUploadedFile(name, content, 'image/gif'))
+
+    def ref_count(self, name):
+        return StoredImage.objects.get(name=name).ref_count
+
+    def test_duplicates_share_file_and_thumbnails(self):
+        """Повторная загрузка не пишет файл и видит готовые миниатюры."""
+        first = self.create_post()
+        thumbnails.generate(first.pk)
+        second = self.create_post(name='repost.gif')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertTrue(image_storage.is_hashed(first.image.name))
+        self.assertEqual(self.ref_count(first.image.name), 2)
+        self.assertIsNotNone(thumbnails.cached(second.image, 'card'))
+
+    def test_replaced_image_is_released(self):
+        post = self.create_post()
+        old_name = post.image.name
+        post.image = SimpleUploadedFile('other.gif', OTHER_GIF)
+        post.save()
+        self.assertNotEqual(post.image.name, old_name)
+        self.assertEqual(self.ref_count(old_name), 0)
+        self.assertEqual(self.ref_count(post.image.name), 1)
+
+    @override_settings(MEDIA_ROOT=tempfile.mkdtemp(dir=TEMP_MEDIA_ROOT))
+    def test_dedup_media_command(self):
+        """Команда сливает дубликаты старых файлов и считает байты."""
+        names = [default_storage.save(f'posts/{name}', ContentFile(content))
+                 for name, content in (('a.gif', SMALL_GIF),
+                                       ('b.gif', SMALL_GIF),
+                                       ('c.gif', OTHER_GIF))]
+        posts = [Post.objects.create(author=self.user, text='Старый пост',
+                                     image=name) for name in names]
+        default_storage.save('posts/orphan.gif', ContentFile(b'orphan'))
+
+        out = StringIO()
+        call_command('dedup_media', '--dry-run', stdout=out)
+        self.assertIn(f'Можно освободить: {len(SMALL_GIF)} байт',
+                      out.getvalue())
+        self.assertTrue(default_storage.exists(names[1]))
+
+        out = StringIO()
+        call_command('dedup_media', '--delete-orphans', stdout=out)
+        self.assertIn('дубликатов: 1', out.getvalue())
+        self.assertIn(f'Освобождено: {len(SMALL_GIF) + 6} байт',
+                      out.getvalue())
+        for post in posts:
+            post.refresh_from_db()
+            self.assertTrue(image_storage.is_hashed(post.image.name))
+            self.assertTrue(post.image.storage.exists(post.image.name))
+        self.assertEqual(posts[0].image.name, posts[1].image.name)
+        self.assertEqual(self.ref_count(posts[0].image.name), 2)
+        self.assertEqual(self.ref_count(posts[2].image.name), 1)
+        for name in (*names, 'posts/orphan.gif'):
+            self.assertFalse(default_storage.exists(name))
+
+    @override_settings(MEDIA_ROOT=tempfile.mkdtemp(dir=TEMP_MEDIA_ROOT))
+    def test_interrupted_dedup_resumes(self):
+        """Упавший перевод не теряет файл и доделывается повторным запуском."""
+        name = default_storage.save('posts/a.gif', ContentFile(SMALL_GIF))
+        post = Post.objects.create(author=self.user, text='Старый пост',
+                                   image=name)
+        with mock.patch.object(media, 'relink', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                media.dedup()
+        post.refresh_from_db()
+        self.assertEqual(post.image.name, name)
+        self.assertTrue(post.image.storage.exists(name))
+
+        media.dedup()
+        post.refresh_from_db()
+        self.assertTrue(image_storage.is_hashed(post.image.name))
+        self.assertTrue(post.image.storage.exists(post.image.name))
+        self.assertFalse(default_storage.exists(name))
+
+    def test_file_deleted_with_last_reference(self):
+        """Файл удаляет задача, когда пропал последний пост."""
+        first = self.create_post()
+        second = self.create_post()
+        name = first.image.name
+        first.delete()
+        self.run_collect()
+        self.assertTrue(image_storage.exists(name))
+        Post.objects.filter(pk=second.pk).defer('image').delete()
+        self.run_collect()
+        self.assertFalse(image_storage.exists(name))
+        self.assertFalse(StoredImage.objects.filter(name=name).exists())
+
+    def test_collect_keeps_reused_file(self):
+        """Если файл успели загрузить снова, задача его не удалит."""
+        post = self.create_post()
+        name = post.image.name
+        post.delete()
+        self.create_post()
+        self.run_collect()
+        self.assertTrue(image_storage.exists(name))
+
+    def run_collect(self):
+        for job in Job.objects.filter(name='posts.tasks.collect_image'):
+            queue.run(job)
+            job.delete()
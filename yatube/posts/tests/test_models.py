@@ -1,4 +1,5 @@
 from django.conf import settings
+from django.db import IntegrityError, transaction
 from django.test import TestCase
 
 from ..models import Comment, Follow, Group, Post, User
@@ -97,3 +98,23 @@ class PostModelTest(TestCase):
                 self.assertEqual(
                     comment_verbose_name._meta.get_field(field).verbose_name,
                     expected_value)
+
+    def test_follow_is_unique(self):
+        """Повторная подписка на того же автора не сохраняется."""
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Follow.objects.create(user=self.fellow.user,
+                                  author=self.fellow.author)
+
+    def test_rendered_text(self):
+        """Пост хранит HTML текста и выдержку для карточек."""
+        post = Post.objects.create(
+            author=self.user,
+            text='<b>Первая</b>\n\n' + 'слово ' * settings.POST_EXCERPT_LENGTH,
+        )
+        self.assertTrue(post.text_html.startswith(
+            '<p>&lt;b&gt;Первая&lt;/b&gt;</p>'))
+        self.assertEqual(len(post.excerpt), settings.POST_EXCERPT_LENGTH)
+        self.assertTrue(post.excerpt_html.endswith('…</p>'))
+        Post.objects.filter(pk=post.pk).update(text='Новый текст')
+        post.refresh_from_db()
+        self.assertEqual(post.excerpt_html, '<p>Новый текст</p>')
@@ -0,0 +1,117 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core.middleware import QueryBudgetExceeded, QueryLog
+
+from .. import views
+from ..models import Comment, Follow, Group, Post, User
+
+
+class QueryBudgetTest(TestCase):
+    """
+    Бюджеты запросов из query_budget проверяет QueryBudgetMiddleware:
+    в тестах она поднимает QueryBudgetExceeded при превышении или N+1.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for number in range(15):
+            cls.post = Post.objects.create(
+                text=f'Пост {number}',
+                author=cls.author,
+                group=cls.group,
+            )
+        for number in range(5):
+            Comment.objects.create(
+                post=cls.post,
+                author=User.objects.create_user(username=f'user{number}'),
+                text='Комментарий',
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def test_views_fit_budget(self):
+        """Страницы с полной лентой укладываются в бюджет без N+1."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.author.username,)),
+            reverse('posts:post_detail', args=(self.post.pk,)),
+            reverse('posts:post_create'),
+            reverse('posts:follow_index'),
+            reverse('posts:profile_unfollow', args=(self.author.username,)),
+            reverse('posts:profile_follow', args=(self.author.username,)),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.reader_client.get(url)
+                Client().get(url)
+
+    def test_forms_fit_budget(self):
+        """Создание, правка и комментирование укладываются в бюджет."""
+        self.author_client.get(
+            reverse('posts:post_edit', args=(self.post.pk,)))
+        self.author_client.post(
+            reverse('posts:post_edit', args=(self.post.pk,)),
+            {'text': 'Правка'})
+        self.author_client.post(reverse('posts:post_create'),
+                                {'text': 'Новый пост'})
+        self.reader_client.post(
+            reverse('posts:add_comment', args=(self.post.pk,)),
+            {'text': 'Ещё комментарий'})
+
+    def test_listing_profile(self):
+        """Карточки из for_listing не догружают ни поля, ни связи."""
+        posts = list(Post.objects.for_listing())
+        self.assertIn('text', posts[0].get_deferred_fields())
+        self.assertIn('password', posts[0].author.get_deferred_fields())
+        with self.assertNumQueries(0):
+            for post in posts:
+                (post.excerpt_html, post.updated, post.author.get_full_name(),
+                 post.author.username, post.group.slug)
+
+    def test_detail_profile(self):
+        """for_detail загружает комментарии с авторами заранее."""
+        post = Post.objects.for_detail().get(pk=self.post.pk)
+        with self.assertNumQueries(0):
+            authors = [comment.author.username
+                       for comment in post.comments.all()]
+            post.author.stats.post_count
+        self.assertEqual(len(authors), 5)
+
+    def test_budget_exceeded(self):
+        """Превышение бюджета пишется в лог и поднимает исключение."""
+        with mock.patch.object(views.index, 'query_budget', 0):
+            with self.assertLogs('yatube.queries', 'WARNING') as logs:
+                with self.assertRaises(QueryBudgetExceeded):
+                    self.reader_client.get(reverse('posts:index'))
+        self.assertEqual(len(logs.records), 1)
+        self.assertRegex(logs.records[0].getMessage(),
+                         r'^posts:index: \d+ queries, budget is 0$')
+
+    def test_repeated_shapes(self):
+        """Одинаковые по форме запросы с разными параметрами - N+1."""
+        log = QueryLog(ignore_tables=('skipped',))
+        log(lambda *args: None, 'SELECT * FROM "skipped"', (), False, {})
+        for params in ((1,), (2,), (3, 4)):
+            log(lambda *args: None,
+                'SELECT * FROM t WHERE id IN (%s)'
+                if len(params) == 1
+                else 'SELECT * FROM t WHERE id IN (%s, %s)',
+                params, False, {})
+        self.assertEqual(log.count, 3)
+        self.assertEqual(log.repeated(1),
+                         {'SELECT * FROM t WHERE id IN (%s)': 2})
@@ -0,0 +1,92 @@
+from io import StringIO
+
+from django.contrib.admin.sites import site
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from .. import search
+from ..models import Group, Post, User
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='lev', first_name='Лев', last_name='Толстой')
+        cls.group = Group.objects.create(title='Романы', slug='novels')
+        cls.war = Post.objects.create(
+            text='Война и мир. Мир, мир и снова мир.', author=cls.author)
+        cls.peace = Post.objects.create(
+            text='Мирное утро в деревне.', author=cls.author,
+            group=cls.group)
+        cls.other = Post.objects.create(
+            text='Совсем другой текст.',
+            author=User.objects.create_user(username='other'))
+
+    def setUp(self):
+        cache.clear()
+
+    def found(self, query, cursor=None, per_page=10):
+        page = search.SearchPaginator(query, per_page).get_page(cursor)
+        return page, [post.pk for post in page]
+
+    def test_ranked_prefix_search(self):
+        """Поиск по префиксу, более релевантный пост первым."""
+        self.assertEqual(self.found('мир')[1],
+                         [self.war.pk, self.peace.pk])
+
+    def test_author_and_group(self):
+        """Находятся посты по имени автора и названию группы."""
+        self.assertEqual(self.found('толстой романы')[1], [self.peace.pk])
+        Group.objects.filter(pk=self.group.pk).update(title='Эпос')
+        self.assertEqual(self.found('эпос')[1], [self.peace.pk])
+
+    def test_index_follows_changes(self):
+        """Изменения и удаление постов сразу видны в поиске."""
+        Post.objects.filter(pk=self.other.pk).update(text='Мировой океан')
+        self.assertIn(self.other.pk, self.found('миров')[1])
+        Post.objects.filter(pk=self.war.pk).delete()
+        self.assertNotIn(self.war.pk, self.found('мир')[1])
+
+    def test_operators_are_escaped(self):
+        """Операторы FTS5 в запросе не ломают поиск."""
+        self.assertEqual(self.found('"OR NEAR( мир')[1], [])
+        self.assertEqual(self.found('***')[1], [])
+
+    def test_keyset_pages(self):
+        """Курсоры ведут на следующую и обратно на первую страницу."""
+        first, ids = self.found('мир', per_page=1)
+        self.assertEqual(ids, [self.war.pk])
+        second, ids = self.found('мир', first.next_cursor, per_page=1)
+        self.assertEqual(ids, [self.peace.pk])
+        self.assertFalse(second.has_next())
+        back, ids = self.found('мир', second.previous_cursor, per_page=1)
+        self.assertEqual(ids, [self.war.pk])
+
+    @override_settings(POSTS_PER_PAGE=1)
+    def test_search_view(self):
+        """Страница поиска выводит результаты и курсор с запросом."""
+        response = self.client.get(reverse('posts:search'), {'q': 'мир'})
+        self.assertEqual(list(response.context['page_obj']), [self.war])
+        self.assertContains(response, '?q=%D0%BC%D0%B8%D1%80&cursor=')
+
+    def test_admin_uses_index(self):
+        """Поиск в админке идёт через индекс."""
+        request = RequestFactory().get('/')
+        queryset, distinct = site._registry[Post].get_search_results(
+            request, Post.objects.all(), 'толстой')
+        self.assertEqual(set(queryset), {self.war, self.peace})
+        self.assertIn(search.TABLE, str(queryset.query))
+
+    def test_rebuild_command(self):
+        """rebuild_search_index восстанавливает индекс."""
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {search.TABLE}')
+        self.assertEqual(self.found('мир')[1], [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.found('мир')[1],
+                         [self.war.pk, self.peace.pk])
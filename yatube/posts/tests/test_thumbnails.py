@@ -0,0 +1,132 @@
+import json
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from jobs import queue
+from jobs.models import Job
+
+from .. import thumbnails
+from ..models import Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+# Та же картинка с другой палитрой: другое содержимое - другой файл.
+OTHER_GIF = SMALL_GIF.replace(b'\xFF\xFF\xFF\x21', b'\xFF\x00\x00\x21')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def create_post(self, name='small.gif', content=SMALL_GIF):
+        return Post.objects.create(
+            author=self.user, text='Пост с картинкой',
+            image=SimpleUploadedFile(name, content, 'image/gif'))
+
+    def test_placeholder_until_generated(self):
+        """До генерации выводится заглушка, после - миниатюра."""
+        post = self.create_post()
+        url = reverse('posts:post_detail', args=(post.pk,))
+        response = self.client.get(url)
+        self.assertContains(response, 'data:image/svg+xml')
+        self.assertContains(response, 'width="960" height="339"')
+        self.assertFalse(Job.objects.exists())
+
+        thumbnails.generate(post.pk)
+        picture = thumbnails.cached(post.image, 'card')
+        self.assertEqual((picture.width, picture.height), (960, 339))
+        self.assertTrue(picture.url.endswith('.jpg'))
+        response = self.client.get(url)
+        self.assertNotContains(response, 'data:image/svg+xml')
+        self.assertContains(response, f'src="{picture.url}"')
+        self.assertContains(response, 'width="960" height="339"')
+        for type_, srcset in picture.sources:
+            self.assertContains(response, f'type="{type_}"')
+
+    def test_variants(self):
+        """Готовятся все ширины в WebP и JPEG, srcset перечисляет их."""
+        post = self.create_post()
+        thumbnails.generate(post.pk)
+        picture = thumbnails.cached(post.image, 'card')
+        self.assertEqual([type_ for type_, _ in picture.sources],
+                         ['image/webp', 'image/jpeg'])
+        webp = picture.sources[0][1].split(', ')
+        self.assertEqual([entry.rsplit(' ', 1)[1] for entry in webp],
+                         ['480w', '720w', '960w'])
+        self.assertTrue(all('.webp ' in entry for entry in webp))
+        for variant in thumbnails.variants('card'):
+            thumbnail = thumbnails.backend.cached_thumbnail(
+                post.image, variant.geometry, **variant.options)
+            self.assertEqual((thumbnail.width, thumbnail.height),
+                             (variant.width, variant.height))
+            self.assertTrue(thumbnail.exists())
+        self.assertFalse(thumbnails.missing(post.image, 'card'))
+
+    def test_card_shows_thumbnail_after_generation(self):
+        """Готовая миниатюра сбрасывает закэшированную карточку поста."""
+        post = self.create_post()
+        self.assertContains(self.client.get(reverse('posts:index')),
+                            'data:image/svg+xml')
+        thumbnails.generate(post.pk)
+        self.assertContains(self.client.get(reverse('posts:index')),
+                            'image/webp')
+
+    def test_upload_schedules_generation(self):
+        """Новая картинка сразу ставит генерацию миниатюр в очередь."""
+        self.client.post(reverse('posts:post_create'), {
+            'text': 'Новый пост',
+            'image': SimpleUploadedFile('new.gif', SMALL_GIF, 'image/gif'),
+        })
+        post = Post.objects.get(text='Новый пост')
+        self.assertTrue(cache.get(thumbnails.pending_key(post.pk)))
+        job = Job.objects.get(name='posts.tasks.generate_thumbnails')
+        queue.run(job)
+        self.assertIsNotNone(thumbnails.cached(post.image, 'card'))
+
+    def test_generate_thumbnails_command(self):
+        """Команда ставит задачи только для картинок без миниатюр."""
+        ready = self.create_post()
+        thumbnails.generate(ready.pk)
+        missing = self.create_post('missing.gif', OTHER_GIF)
+        call_command('generate_thumbnails', stdout=StringIO())
+        job = Job.objects.get()
+        self.assertEqual(json.loads(job.payload)['args'], [missing.pk])
+
+    def test_generate_thumbnails_command_new_width(self):
+        """После добавления ширины команда ставит задачу и на готовые."""
+        post = self.create_post()
+        thumbnails.generate(post.pk)
+        variants = {'card': {**settings.POST_IMAGE_VARIANTS['card'],
+                             'widths': (320, 480, 720, 960)}}
+        with self.settings(POST_IMAGE_VARIANTS=variants):
+            self.assertIsNotNone(thumbnails.cached(post.image, 'card'))
+            call_command('generate_thumbnails', stdout=StringIO())
+        self.assertEqual(Job.objects.count(), 1)
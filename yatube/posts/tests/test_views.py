@@ -1,4 +1,6 @@
+import base64
 import tempfile
+from http import HTTPStatus
 from shutil import rmtree
 from typing import NamedTuple
 
@@ -8,8 +10,12 @@ from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from django.utils.http import http_date
+
+from core.cache import get_generation
 
 from ..models import Follow, Group, Post, User
+from ..utils import CachedCountPaginator, count_cache_key, decode_cursor
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
@@ -235,6 +241,81 @@ class PostsPaginatorTest(TestCase):
                 len(response.context.get('page_obj').object_list),
                 posts_number_on_next_page)
 
+    def test_cursor_paginator(self):
+        """
+        Курсорная пагинация проходит все посты без повторов
+        и возвращается назад на первую страницу.
+        """
+        for url in self.paginator.values():
+            with self.subTest(url=url.name):
+                response = self.follower_client.get(url.name + '?cursor=')
+                first_page = response.context.get('page_obj')
+                self.assertFalse(first_page.has_previous())
+                response = self.follower_client.get(
+                    f'{url.name}?cursor={first_page.next_cursor}')
+                next_page = response.context.get('page_obj')
+                self.assertFalse(next_page.has_next())
+                seen = [post.pk for post in first_page]
+                seen += [post.pk for post in next_page]
+                self.assertEqual(len(set(seen)),
+                                 PostsPaginatorTest.test_posts_paginator)
+                response = self.follower_client.get(
+                    f'{url.name}?cursor={next_page.previous_cursor}')
+                self.assertEqual(
+                    [post.pk for post in response.context.get('page_obj')],
+                    [post.pk for post in first_page])
+
+    def test_tampered_cursor(self):
+        """Испорченный курсор открывает первую страницу, а не ошибку."""
+        for pk in ('"x"', 'null', '[1]', 'true'):
+            raw = f'["n", "2020-01-01T00:00:00", {pk}]'.encode()
+            cursor = base64.urlsafe_b64encode(raw).decode()
+            with self.subTest(pk=pk):
+                self.assertIsNone(decode_cursor(cursor))
+                response = self.follower_client.get(
+                    f'{self.paginator["index"].name}?cursor={cursor}')
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertFalse(
+                    response.context.get('page_obj').has_previous())
+
+    def test_paginator_count_is_cached(self):
+        """Количество постов берётся из кэша и сбрасывается новым постом."""
+        cache.clear()
+        key = count_cache_key('index')
+        CachedCountPaginator(Post.objects.all(), 10, count_key=key).count
+        with self.assertNumQueries(0):
+            count = CachedCountPaginator(Post.objects.all(), 10,
+                                         count_key=key).count
+        self.assertEqual(count, PostsPaginatorTest.test_posts_paginator)
+        Post.objects.create(text='Ещё пост', author=self.user)
+        response = self.follower_client.get(self.paginator['index'].name)
+        self.assertEqual(response.context['page_obj'].paginator.count,
+                         PostsPaginatorTest.test_posts_paginator + 1)
+
+    def test_moved_post_resets_both_group_counts(self):
+        """Перенос поста сбрасывает количество постов в обеих группах."""
+        other = Group.objects.create(title='Другая', slug='other')
+        post = Post.objects.create(text='Переезжающий пост',
+                                   author=self.user, group=self.group)
+        keys = [count_cache_key('group', group.pk)
+                for group in (self.group, other)]
+        cache.set_many({key: 1 for key in keys})
+        post = Post.objects.get(pk=post.pk)
+        post.group = other
+        post.save()
+        self.assertEqual(cache.get_many(keys), {})
+
+    def test_elided_page_range(self):
+        """Номера страниц выводятся окном вокруг текущей."""
+        paginator = CachedCountPaginator(range(1000), 10)
+        ellipsis = CachedCountPaginator.ELLIPSIS
+        self.assertEqual(
+            list(paginator.get_elided_page_range(50)),
+            [1, ellipsis, 48, 49, 50, 51, 52, ellipsis, 100])
+        self.assertEqual(
+            list(paginator.get_elided_page_range(1)),
+            [1, 2, 3, ellipsis, 100])
+
 
 class PostsNewPostTest(TestCase):
     @classmethod
@@ -294,14 +375,12 @@ class CacheTest(TestCase):
 
     def setUp(self):
         self.guest_client = Client()
+        cache.clear()
 
     def test_cache_index_pages(self):
         """Тест кэша на главной странице."""
         first_response = self.client.get(reverse('posts:index'))
-        Post.objects.create(
-            text='Другой текст',
-            author=CacheTest.user,
-        )
+        Post.objects.filter(pk=CacheTest.post.pk).update(text='Другой текст')
         second_response = self.client.get(reverse('posts:index'))
         self.assertEqual(
             first_response.content,
@@ -315,6 +394,94 @@ class CacheTest(TestCase):
         )
         cache.clear()
 
+    def test_new_post_resets_cache(self):
+        """Новый пост сразу появляется на закэшированных страницах."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:profile', args=(CacheTest.user.username,)),
+        )
+        for url in urls:
+            self.client.get(url)
+        Post.objects.create(
+            text='Другой текст',
+            author=CacheTest.user,
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertContains(self.client.get(url), 'Другой текст')
+
+    def test_post_card_cache(self):
+        """
+        Карточка поста рендерится один раз для всех лент
+        и обновляется после редактирования поста.
+        """
+        profile = reverse('posts:profile', args=(CacheTest.user.username,))
+        self.client.get(reverse('posts:index'))
+        Post.objects.filter(pk=CacheTest.post.pk).update(text='Другой текст')
+        self.assertNotContains(self.client.get(profile), 'Другой текст')
+        post = Post.objects.get(pk=CacheTest.post.pk)
+        post.save()
+        self.assertContains(self.client.get(profile), 'Другой текст')
+
+    def test_author_rename_resets_cache(self):
+        """Новое имя автора сразу видно в закэшированных лентах."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:profile', args=(CacheTest.user.username,)),
+        )
+        for url in urls:
+            self.guest_client.get(url)
+        user = User.objects.get(pk=CacheTest.user.pk)
+        user.first_name = 'Моисей'
+        user.save()
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertContains(self.guest_client.get(url), 'Моисей')
+
+    def test_user_save_without_rename_keeps_cache(self):
+        """Сохранение пользователя без смены имени не сбрасывает кэш."""
+        generation = get_generation('posts')
+        user = User.objects.get(pk=CacheTest.user.pk)
+        user.set_password('new-password')
+        user.save()
+        user.first_name = user.first_name
+        user.save()
+        self.assertEqual(get_generation('posts'), generation)
+
+    def test_page_cache_key_params(self):
+        """
+        Ключ кэша страницы учитывает только параметры, которые читает
+        view; запросы с чужими параметрами не кэшируются.
+        """
+        url = reverse('posts:index')
+        etag = self.guest_client.get(f'{url}?page=1&q=x')['ETag']
+        self.assertEqual(
+            self.guest_client.get(f'{url}?q=x&page=1')['ETag'], etag)
+        self.assertNotEqual(
+            self.guest_client.get(f'{url}?page=2&q=x')['ETag'], etag)
+        response = self.guest_client.get(f'{url}?x=1')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertFalse(response.has_header('ETag'))
+
+    def test_conditional_get(self):
+        """
+        Повторный запрос гостя с ETag или Last-Modified получает 304
+        без запросов к базе, пока посты не изменились.
+        """
+        url = reverse('posts:index')
+        response = self.guest_client.get(url)
+        etag = response['ETag']
+        with self.assertNumQueries(0):
+            response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        response = self.guest_client.get(
+            url, HTTP_IF_MODIFIED_SINCE=http_date())
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        Post.objects.create(text='Другой текст', author=CacheTest.user)
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertContains(response, 'Другой текст')
+
 
 class FollowTest(TestCase):
     @classmethod
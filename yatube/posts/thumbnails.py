@@ -0,0 +1,162 @@
+"""
+Адаптивные варианты картинок постов.
+
+Картинка уменьшается не в запросе, а в фоне: schedule() ставит
+задачу generate_thumbnails в очередь jobs, и воркер готовит все
+ширины и форматы из POST_IMAGE_VARIANTS. Шаблонный тег post_picture
+заглядывает в kvstore sorl-thumbnail только за последним вариантом -
+запасным форматом наибольшей ширины, он готовится последним. Если он
+есть, адреса остальных вычисляются по именам без обращения к kvstore,
+иначе выводится заглушка тех же размеров. Когда варианты готовы,
+карточка поста и кэш страниц сбрасываются, чтобы вместо заглушки
+вышла картинка. Для картинок, загруженных раньше, и после изменения
+вариантов задачи ставит команда generate_thumbnails.
+"""
+from collections import namedtuple
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import dateformat
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+
+from core.cache import bump_generation, drop_fragment
+from jobs.queue import enqueue
+
+from .models import Post
+
+# Сколько секунд повторные schedule() для поста ничего не делают:
+# задача уже в очереди и ждёт воркера.
+PENDING_TIMEOUT = 10 * 60
+
+
+class Backend(ThumbnailBackend):
+    def thumbnail_name(self, file_, geometry_string, **options):
+        """
+        Имя миниатюры в хранилище. Опции дополняются так же, как
+        в get_thumbnail(), чтобы имя совпало.
+        """
+        source = ImageFile(file_)
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(sorl_defaults, attr):
+                options.setdefault(key, value)
+        return self._get_thumbnail_filename(source, geometry_string, options)
+
+    def cached_thumbnail(self, file_, geometry_string, **options):
+        """Миниатюра из kvstore или None."""
+        name = self.thumbnail_name(file_, geometry_string, **options)
+        return default.kvstore.get(ImageFile(name, default.storage))
+
+
+backend = Backend()
+
+
+class Variant(namedtuple('Variant', 'format width height options')):
+    @property
+    def geometry(self):
+        return f'{self.width}x{self.height}'
+
+
+class Picture:
+    """
+    Картинка для <picture>: sources - пары (MIME-тип, srcset)
+    по форматам, url - запасной формат наибольшей ширины.
+    """
+
+    def __init__(self, url, width, height, sources=(), sizes=''):
+        self.url = url
+        self.width = width
+        self.height = height
+        self.sources = sources
+        self.sizes = sizes
+
+
+def variants(size):
+    """
+    Варианты size из POST_IMAGE_VARIANTS по форматам и возрастанию
+    ширины: последний - запасной формат наибольшей ширины.
+    """
+    spec = settings.POST_IMAGE_VARIANTS[size]
+    width, height = spec['size']
+    return [
+        Variant(format_, variant_width,
+                max(round(variant_width * height / width), 1),
+                {**spec['options'], 'format': format_})
+        for format_ in spec['formats']
+        for variant_width in sorted(spec['widths'])
+    ]
+
+
+def cached(image, size):
+    """Готовые варианты картинки размера size или None."""
+    spec = settings.POST_IMAGE_VARIANTS[size]
+    *rest, last = variants(size)
+    fallback = backend.cached_thumbnail(image, last.geometry, **last.options)
+    if fallback is None:
+        return None
+    srcsets = {}
+    for variant in rest:
+        name = backend.thumbnail_name(image, variant.geometry,
+                                      **variant.options)
+        srcsets.setdefault(variant.format, []).append(
+            f'{default.storage.url(name)} {variant.width}w')
+    srcsets.setdefault(last.format, []).append(
+        f'{fallback.url} {last.width}w')
+    sources = [(f'image/{format_.lower()}', ', '.join(srcset))
+               for format_, srcset in srcsets.items()]
+    return Picture(fallback.url, last.width, last.height,
+                   sources, spec['sizes'])
+
+
+def missing(image, size):
+    """Есть ли у картинки неготовые варианты size."""
+    return any(
+        backend.cached_thumbnail(image, variant.geometry,
+                                 **variant.options) is None
+        for variant in variants(size))
+
+
+def placeholder(size):
+    """Серый SVG размером с будущую картинку, встроенный в data: URL."""
+    width, height = settings.POST_IMAGE_VARIANTS[size]['size']
+    svg = (f"<svg xmlns='http://www.w3.org/2000/svg' "
+           f"width='{width}' height='{height}'>"
+           f"<rect width='100%' height='100%' fill='#e9ecef'/></svg>")
+    return Picture('data:image/svg+xml,' + quote(svg), width, height)
+
+
+def pending_key(post_id):
+    return f'thumbnails:pending:{post_id}'
+
+
+def generate(post_id):
+    """Готовит все варианты картинки поста и сбрасывает его кэш."""
+    try:
+        post = Post.objects.only('image', 'updated').get(pk=post_id)
+    except Post.DoesNotExist:
+        return
+    finally:
+        cache.delete(pending_key(post_id))
+    if post.image:
+        for size in settings.POST_IMAGE_VARIANTS:
+            for variant in variants(size):
+                backend.get_thumbnail(post.image, variant.geometry,
+                                      **variant.options)
+    drop_fragment('post_card', post.pk,
+                  dateformat.format(post.updated, 'U.u'))
+    bump_generation('posts')
+
+
+def schedule(post_id):
+    """Ставит генерацию миниатюр поста в очередь задач."""
+    if cache.add(pending_key(post_id), True, PENDING_TIMEOUT):
+        enqueue('posts.tasks.generate_thumbnails', (post_id,))
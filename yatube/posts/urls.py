@@ -14,6 +14,9 @@ urlpatterns = [
     path('create/', views.post_create, name='post_create'),
     path("posts/<int:post_id>/edit/", views.post_edit, name='post_edit'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('search/', views.search, name='search'),
+    path('profile/<str:username>/export/', views.profile_export,
+         name='profile_export'),
     path('profile/<str:username>/follow/', views.profile_follow,
          name='profile_follow'
          ),
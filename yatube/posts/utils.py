@@ -1,7 +1,229 @@
+import base64
+import json
+
 from django.conf import settings
+from django.core.cache import cache
 from django.core.paginator import Paginator
+from django.db.models import Max, Min, Q, QuerySet
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+from core.cache import replica_may_lag
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+def encode_cursor(direction, post):
+    """Упаковывает позицию поста (pub_date, id) в непрозрачный курсор."""
+    raw = json.dumps([direction, post.pub_date.isoformat(), post.pk])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Распаковывает курсор в (направление, pub_date, id).
+    Для пустого или испорченного курсора возвращает None.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        direction, pub_date, pk = json.loads(
+            base64.urlsafe_b64decode(padded.encode()))
+        pub_date = parse_datetime(pub_date)
+    except (TypeError, ValueError):
+        return None
+    if (direction not in (NEXT, PREVIOUS) or pub_date is None
+            or type(pk) is not int):
+        return None
+    return direction, pub_date, pk
+
+
+class CursorPage:
+    """Страница курсорной пагинации."""
+
+    is_cursor = True
+
+    def __init__(self, object_list, cursor='', next_cursor=None,
+                 previous_cursor=None):
+        self.object_list = object_list
+        self.cursor = cursor
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<CursorPage {self.cursor or "first"}>'
+
+    @property
+    def number(self):
+        """Курсор однозначно задаёт страницу, как номер у Page."""
+        return self.cursor
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """
+    Keyset-пагинация постов по (pub_date, id).
+    Не считает COUNT(*) и не делает OFFSET, поэтому глубокие
+    страницы открываются так же быстро, как первая.
+    """
+
+    def __init__(self, object_list, per_page):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+
+    def get_page(self, cursor):
+        position = decode_cursor(cursor or '')
+        if position is None:
+            return self._page(self._after(None), '', first=True)
+        direction, pub_date, pk = position
+        if direction == NEXT:
+            return self._page(self._after((pub_date, pk)), cursor)
+        return self._page(self._before((pub_date, pk)), cursor)
+
+    def _after(self, position):
+        posts = self.object_list.order_by('-pub_date', '-pk')
+        if position is not None:
+            pub_date, pk = position
+            posts = posts.filter(
+                Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, pk__lt=pk))
+        return NEXT, list(posts[:self.per_page + 1])
+
+    def _before(self, position):
+        pub_date, pk = position
+        posts = self.object_list.order_by('pub_date', 'pk').filter(
+            Q(pub_date__gt=pub_date) | Q(pub_date=pub_date, pk__gt=pk))
+        return PREVIOUS, list(posts[:self.per_page + 1])
+
+    def _page(self, fetched, cursor, first=False):
+        direction, posts = fetched
+        has_more = len(posts) > self.per_page
+        posts = posts[:self.per_page]
+        if direction == PREVIOUS:
+            posts.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, not first
+        if not posts:
+            return CursorPage(posts, cursor)
+        return CursorPage(
+            posts,
+            cursor,
+            next_cursor=(encode_cursor(NEXT, posts[-1])
+                         if has_next else None),
+            previous_cursor=(encode_cursor(PREVIOUS, posts[0])
+                             if has_previous else None),
+        )
+
+
+def count_cache_key(name, pk=None):
+    """Ключ кэша с количеством постов в ленте index, group или profile."""
+    if pk is None:
+        return f'posts:count:{name}'
+    return f'posts:count:{name}:{pk}'
+
+
+def profile_namespace(username):
+    """Поколение кэша профиля: счётчики подписок и подписчиков."""
+    return f'profile:{username}'
+
+
+class CachedCountPaginator(Paginator):
+    """
+    Paginator, который не считает COUNT(*) на каждый запрос.
+
+    Количество берётся из явно переданного счётчика, из кэша по count_key
+    или, для нефильтрованных таблиц больше PAGINATOR_ESTIMATE_THRESHOLD,
+    оценивается по диапазону первичных ключей. Ключи кэша сбрасываются
+    сигналами при создании и удалении постов, остальное догоняет
+    PAGINATOR_COUNT_TIMEOUT.
+    """
+
+    ELLIPSIS = '…'
+
+    def __init__(self, object_list, per_page, orphans=0,
+                 allow_empty_first_page=True, count_key=None, count=None):
+        super().__init__(object_list, per_page, orphans,
+                         allow_empty_first_page)
+        self.count_key = count_key
+        if count is not None:
+            self.count = count
+
+    @cached_property
+    def count(self):
+        if self.count_key is not None:
+            count = cache.get(self.count_key)
+            if count is not None:
+                return count
+        count = self._estimate_count()
+        if count is None:
+            count = super().count
+        if self.count_key is not None and not replica_may_lag():
+            cache.set(self.count_key, count,
+                      settings.PAGINATOR_COUNT_TIMEOUT)
+        return count
+
+    def _estimate_count(self):
+        """Оценка размера нефильтрованной таблицы по min/max id."""
+        queryset = self.object_list
+        if not isinstance(queryset, QuerySet) or queryset.query.where:
+            return None
+        bounds = queryset.order_by().aggregate(low=Min('pk'), high=Max('pk'))
+        if bounds['high'] is None:
+            return 0
+        estimate = bounds['high'] - bounds['low'] + 1
+        if estimate < settings.PAGINATOR_ESTIMATE_THRESHOLD:
+            return None
+        return estimate
+
+    def get_elided_page_range(self, number=1, on_each_side=2, on_ends=1):
+        """
+        Окно номеров страниц: первые и последние on_ends страниц
+        и on_each_side соседей текущей, пропуски заменены на ELLIPSIS.
+        """
+        number = self.validate_number(number)
+        if self.num_pages <= (on_each_side + on_ends) * 2:
+            yield from self.page_range
+            return
+        if number > 1 + on_each_side + on_ends + 1:
+            yield from range(1, on_ends + 1)
+            yield self.ELLIPSIS
+            yield from range(number - on_each_side, number + 1)
+        else:
+            yield from range(1, number + 1)
+        if number < self.num_pages - on_each_side - on_ends - 1:
+            yield from range(number + 1, number + on_each_side + 1)
+            yield self.ELLIPSIS
+            yield from range(self.num_pages - on_ends + 1,
+                             self.num_pages + 1)
+        else:
+            yield from range(number + 1, self.num_pages + 1)
 
 
-def paginator(request, post_list):
-    pages_paginator = Paginator(post_list, settings.POSTS_PER_PAGE)
+def paginator(request, post_list, count_key=None, count=None):
+    if (settings.POSTS_PAGINATION == 'cursor'
+            or 'cursor' in request.GET):
+        return CursorPaginator(
+            post_list, settings.POSTS_PER_PAGE
+        ).get_page(request.GET.get('cursor'))
+    pages_paginator = CachedCountPaginator(post_list,
+                                           settings.POSTS_PER_PAGE,
+                                           count_key=count_key,
+                                           count=count)
     return pages_paginator.get_page(request.GET.get('page'))
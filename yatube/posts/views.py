@@ -1,32 +1,46 @@
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.core.exceptions import PermissionDenied
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 
+from core.cache import get_generation
+from core.decorators import anonymous_page_cache, query_budget
+
+from . import exporter, thumbnails
+from .counters import stats_for
 from .forms import CommentForm, PostForm
 from .models import Follow, Group, Post, User
-from .utils import paginator
+from .search import SearchPaginator
+from .utils import count_cache_key, paginator, profile_namespace
 
 
+@anonymous_page_cache('posts')
+@query_budget(6)
 def index(request):
     """
     Функция для вывода главной страницы
     и первых 10-ти постов из БД постранично.
     """
-    post_list = Post.objects.select_related().all()
-    page_obj = paginator(request, post_list)
+    post_list = Post.objects.for_listing()
+    page_obj = paginator(request, post_list, count_cache_key('index'))
     context = {
         'page_obj': page_obj,
     }
     return render(request, 'posts/index.html', context)
 
 
+@anonymous_page_cache('posts')
+@query_budget(6)
 def group_posts(request, slug):
     """
     Функция для вывода страниц сообщества и
     первых 10-ти постов из БД постранично.
     """
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.select_related().all()
-    page_obj = paginator(request, post_list)
+    post_list = group.posts.for_listing()
+    page_obj = paginator(request, post_list,
+                         count_cache_key('group', group.pk))
     context = {
         'group': group,
         'page_obj': page_obj,
@@ -34,29 +48,40 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+@anonymous_page_cache(
+    'posts', lambda request, username: profile_namespace(username))
+@query_budget(7)
 def profile(request, username):
     """Функция для вывода всех постов пользователя."""
-    author = get_object_or_404(User, username=username)
-    post_list = author.posts.select_related().all()
-    page_obj = paginator(request, post_list)
+    author = get_object_or_404(User.objects.select_related('stats'),
+                               username=username)
+    stats = stats_for(author)
+    post_list = author.posts.for_listing()
+    page_obj = paginator(request, post_list,
+                         count_cache_key('profile', author.pk),
+                         count=stats.post_count)
     following = (request.user != author
                  and request.user.is_authenticated
                  and Follow.objects.filter(user=request.user,
                                            author=author).exists())
     context = {
         'author': author,
+        'stats': stats,
         'page_obj': page_obj,
         'following': following,
+        'profile_generation': get_generation(
+            profile_namespace(author.username)),
     }
     return render(request, 'posts/profile.html', context)
 
 
+@anonymous_page_cache('posts', 'comments')
+@query_budget(6)
 def post_detail(request, post_id):
     """
     Функция для вывода информации об отдельном посте пользователя.
     """
-    post = get_object_or_404(Post.objects.select_related(),
-                             pk=post_id)
+    post = get_object_or_404(Post.objects.for_detail(), pk=post_id)
     form = CommentForm(request.POST or None)
     comments = post.comments.all()
     context = {'post': post,
@@ -69,6 +94,7 @@ def post_detail(request, post_id):
 
 
 @login_required
+@query_budget(12)
 def post_create(request):
     """
     Функция для создания нового поста,
@@ -80,6 +106,8 @@ def post_create(request):
         new_post_create = form.save(commit=False)
         new_post_create.author = request.user
         form.save()
+        if new_post_create.image:
+            thumbnails.schedule(new_post_create.pk)
         return redirect('posts:profile',
                         username=request.user)
     context = {
@@ -91,13 +119,13 @@ def post_create(request):
 
 
 @login_required
+@query_budget(12)
 def post_edit(request, post_id):
     """
     Функция для редактирования поста новым пользователем.
     """
-    post = get_object_or_404(Post.objects.select_related(),
-                             pk=post_id)
-    if request.user != post.author:
+    post = get_object_or_404(Post, pk=post_id)
+    if request.user.pk != post.author_id:
         return redirect('posts:post_detail',
                         post_id=post_id)
     form = PostForm(
@@ -107,6 +135,8 @@ def post_edit(request, post_id):
     )
     if form.is_valid():
         form.save()
+        if 'image' in form.changed_data and post.image:
+            thumbnails.schedule(post.pk)
         return redirect('posts:post_detail',
                         post_id=post.id)
     context = {
@@ -120,9 +150,10 @@ def post_edit(request, post_id):
 
 
 @login_required
+@query_budget(7)
 def add_comment(request, post_id):
     """Функция, дающая возможность оставлять комментарии."""
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(Post.objects.only('pk'), id=post_id)
     form = CommentForm(request.POST or None)
     if form.is_valid():
         comment = form.save(commit=False)
@@ -133,9 +164,35 @@ def add_comment(request, post_id):
 
 
 @login_required
+@query_budget(3)
+def profile_export(request, username):
+    """
+    Выгрузка постов или комментариев автора для него самого
+    и для персонала. Файл отдаётся потоком по мере чтения из БД.
+    """
+    author = get_object_or_404(User, username=username)
+    if request.user != author and not request.user.is_staff:
+        raise PermissionDenied
+    kind = request.GET.get('kind', 'posts')
+    fmt = request.GET.get('format', 'jsonl')
+    if kind not in exporter.KINDS or fmt not in exporter.FORMATS:
+        raise Http404
+    response = StreamingHttpResponse(
+        exporter.stream(author, kind, fmt),
+        content_type=exporter.CONTENT_TYPES[fmt],
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{exporter.filename(author, kind, fmt)}"')
+    return response
+
+
+@login_required
+@query_budget(6)
 def follow_index(request):
     """Отображение подписок."""
-    post = Post.objects.filter(author__following__user=request.user)
+    post = Post.objects.for_listing().filter(
+        feed_items__user=request.user,
+    ).order_by('-feed_items__pub_date')
     page_obj = paginator(request, post)
     context = {
         'page_obj': page_obj,
@@ -143,7 +200,23 @@ def follow_index(request):
     return render(request, 'posts/follow.html', context)
 
 
+@anonymous_page_cache('posts')
+@query_budget(4)
+def search(request):
+    """Полнотекстовый поиск по постам, лучшие совпадения первыми."""
+    query = request.GET.get('q', '').strip()
+    page_obj = SearchPaginator(
+        query, settings.POSTS_PER_PAGE
+    ).get_page(request.GET.get('cursor'))
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
+@query_budget(12)
 def profile_follow(request, username):
     """Подписаться на автора."""
     if username != request.user.username:
@@ -156,10 +229,15 @@ def profile_follow(request, username):
 
 
 @login_required
+@query_budget(10)
 def profile_unfollow(request, username):
     """Отписаться от автора."""
     author = get_object_or_404(User, username=username)
-    follower = Follow.objects.filter(user=request.user, author=author)
-    if follower.exists():
+    # Пользователи загружаются вместе с подпиской: сигнал сбросит
+    # кэш их профилей без лишних запросов.
+    follower = Follow.objects.filter(
+        user=request.user, author=author).select_related(
+            'user', 'author').first()
+    if follower is not None:
         follower.delete()
     return redirect('posts:profile', username)
@@ -0,0 +1,12 @@
+"""Фоновые задачи приложения users, их выполняет runworker."""
+from django.core.mail import EmailMultiAlternatives
+
+from jobs.queue import task
+
+
+@task(priority=10)
+def send_email(subject, body, from_email, recipients, html=None):
+    message = EmailMultiAlternatives(subject, body, from_email, recipients)
+    if html is not None:
+        message.attach_alternative(html, 'text/html')
+    message.send()
@@ -8,6 +8,7 @@ from django.contrib.auth.views import (LoginView, LogoutView,
 from django.urls import path
 
 from . import views
+from .forms import PasswordResetForm
 
 app_name = 'users'
 
@@ -40,7 +41,8 @@ urlpatterns = [
     path(
         'password_reset/',
         PasswordResetView.as_view
-        (template_name='users/password_reset_form.html'),
+        (template_name='users/password_reset_form.html',
+         form_class=PasswordResetForm),
         name='password_reset_form'
     ),
     path(
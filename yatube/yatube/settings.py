@@ -41,6 +41,7 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'jobs.apps.JobsConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -52,12 +53,14 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.QueryBudgetMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
@@ -68,8 +71,33 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 POSTS_PER_PAGE = 10
 
+# 'pages' - постраничная навигация по номерам, 'cursor' - keyset-пагинация
+# по (pub_date, id) без COUNT(*) и OFFSET.
+POSTS_PAGINATION = 'pages'
+
+# Сколько секунд хранится в кэше количество постов в ленте.
+PAGINATOR_COUNT_TIMEOUT = 60 * 5
+
+# Начиная с какого размера нефильтрованной таблицы количество
+# оценивается по диапазону id вместо COUNT(*).
+PAGINATOR_ESTIMATE_THRESHOLD = 100_000
+
 CHAR_NUMBER_FOR_ADMIN = 15
 
+# Длина выдержки из текста поста, которую показывают карточки в лентах.
+POST_EXCERPT_LENGTH = 500
+
+# Учёт SQL-запросов: бюджеты view из декоратора query_budget и поиск N+1
+# (одна форма запроса больше QUERY_BUDGET_REPEAT_LIMIT раз за запрос).
+# При QUERY_BUDGET_RAISE нарушение поднимает исключение, иначе пишется
+# в лог yatube.queries.
+QUERY_BUDGET_ENABLED = DEBUG
+QUERY_BUDGET_RAISE = False
+QUERY_BUDGET_REPEAT_LIMIT = 3
+# sorl-thumbnail ходит в свой kvstore, только пока его кэш холодный:
+# это разовая цена картинки, а не страницы.
+QUERY_BUDGET_IGNORE_TABLES = ('thumbnail_kvstore',)
+
 LOGIN_URL = 'users:login'
 
 LOGIN_REDIRECT_URL = 'posts:index'
@@ -81,10 +109,87 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Нормализация картинок постов при загрузке: картинка уменьшается,
+# чтобы поместиться в POST_IMAGE_MAX_SIZE, поворачивается по EXIF
+# и пересохраняется без метаданных. JPEG и WebP сохраняются
+# с качеством POST_IMAGE_QUALITY, форматы, которые браузеры
+# не показывают, переводятся в JPEG или PNG. Картинки, загруженные
+# раньше, нормализует команда normalize_images.
+POST_IMAGE_MAX_SIZE = (1920, 1920)
+POST_IMAGE_QUALITY = 85
+
+# Адаптивные варианты картинок постов: имя -> описание.
+# size - пропорции и наибольший размер, widths - ширины вариантов для
+# srcset, formats - форматы от предпочтительного к запасному (запасной
+# выводится в <img src>), sizes - атрибут sizes, options - опции
+# sorl-thumbnail. Варианты обрезаются точно в размер, поэтому width
+# и height в разметке известны заранее. Все варианты готовит задача
+# jobs после загрузки картинки, пока их нет, выводится заглушка.
+# После изменения вариантов недостающие ставит в очередь команда
+# generate_thumbnails.
+POST_IMAGE_VARIANTS = {
+    'card': {
+        'size': (960, 339),
+        'widths': (480, 720, 960),
+        'formats': ('WEBP', 'JPEG'),
+        'sizes': '(min-width: 992px) 960px, 100vw',
+        'options': {'crop': 'center', 'upscale': True, 'quality': 80},
+    },
+}
+
+# Очередь фоновых задач (приложение jobs, команда runworker).
+# JOBS_EAGER выполняет задачи сразу при постановке, без воркера.
+JOBS_EAGER = False
+# Сколько секунд взятая задача не видна другим воркерам. Воркер
+# продлевает её, пока выполняет, поэтому таймаут ограничивает только
+# время, через которое задачу упавшего воркера возьмёт другой.
+JOBS_VISIBILITY_TIMEOUT = 5 * 60
+JOBS_MAX_ATTEMPTS = 5
+# Задержка перед повтором удваивается с каждой попыткой до максимума.
+JOBS_RETRY_BACKOFF = 10
+JOBS_RETRY_BACKOFF_MAX = 60 * 60
+JOBS_POLL_INTERVAL = 1
+
+# Посты авторов, у которых подписчиков больше, раскладываются
+# по лентам задачей jobs, а не в запросе, создавшем пост.
+FEED_FANOUT_INLINE_LIMIT = 1000
+
+# Время жизни кэша страниц с постами. Новые посты появляются сразу:
+# ключи фрагментов включают поколение, которое сбрасывают сигналы Post.
+PAGE_CACHE_TIMEOUT = 60 * 60
+
+# Время жизни кэша карточки поста. Ключ карточки включает id поста
+# и дату изменения, поэтому устаревшая карточка никогда не выводится.
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Сколько секунд после истечения ключа отдаётся устаревшее значение,
+# пока один воркер пересчитывает его, и сколько держится блокировка
+# пересчёта.
+CACHE_STALE_TIMEOUT = 60
+CACHE_LOCK_TIMEOUT = 10
+
+# Один файл кэша на хост разделяют все воркеры WSGI.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': 'core.cache_backends.sqlite.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'default.sqlite3'),
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': 100_000,
+            'MAX_SIZE': 256 * 1024 * 1024,
+        },
+    },
+    # Память процесса перед общим кэшем для фрагментов, которые читаются
+    # почти на каждой странице: карточки постов, шапка группы, имена авторов.
+    'local': {
+        'BACKEND': 'core.cache_backends.tiered.TieredCache',
+        'LOCATION': 'default',
+        'OPTIONS': {
+            'MAX_ENTRIES': 2000,
+            'L1_TIMEOUT': 30,
+            'POLL_INTERVAL': 1,
+        },
+    },
 }
 
 TEMPLATES = [
@@ -101,6 +206,7 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'core.context_processors.year.year',
+                'core.context_processors.generations.generations',
             ],
         },
     },
@@ -114,11 +220,47 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'core.db_backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+        'CONN_MAX_AGE': 60,
+    },
+    # Копия основной базы только для чтения. Локально её обновляет
+    # команда sync_replica.
+    'replica': {
+        'ENGINE': 'core.db_backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'db_replica.sqlite3'),
+        'CONN_MAX_AGE': 60,
+        'TEST': {
+            'MIRROR': 'default',
+        },
+    },
 }
 
+# core.db_backends.sqlite3 - стандартный бэкенд SQLite, в котором atomic()
+# начинает транзакцию с BEGIN IMMEDIATE.
+# Прагмы выполняются для каждого нового соединения с SQLite (core.signals).
+# WAL разрешает читать параллельно с записью, synchronous=NORMAL в WAL
+# не теряет целостность при сбое процесса, а busy_timeout заставляет
+# ждать блокировку вместо немедленного "database is locked".
+SQLITE_PRAGMAS = (
+    'journal_mode=WAL',
+    'synchronous=NORMAL',
+    'busy_timeout=5000',
+    'cache_size=-65536',
+    'mmap_size=268435456',
+    'temp_store=MEMORY',
+)
+
+DATABASE_ROUTERS = ['core.db_routers.ReplicaRouter']
+
+# GET-запросы к view этих приложений читают с реплики, если USE_REPLICA.
+# После записи пользователь REPLICA_PIN_SECONDS секунд читает из основной
+# базы, чтобы сразу видеть свои изменения.
+USE_REPLICA = False
+REPLICA_APPS = ('posts', 'about')
+REPLICA_PIN_COOKIE = 'primary_pin'
+REPLICA_PIN_SECONDS = 10
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
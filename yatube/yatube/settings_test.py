@@ -0,0 +1,23 @@
+"""
+Настройки для тестов. Их выбирают manage.py test и pytest.ini.
+"""
+import atexit
+import os
+import shutil
+import tempfile
+
+from .settings import *  # noqa: F401,F403
+from .settings import CACHES
+
+# Тесты создают свою базу, поэтому не должны видеть фрагменты,
+# закэшированные для рабочей базы: у них свой файл кэша.
+CACHE_DIR = tempfile.mkdtemp(prefix='yatube-cache-')
+atexit.register(shutil.rmtree, CACHE_DIR, ignore_errors=True)
+CACHES['default']['LOCATION'] = os.path.join(CACHE_DIR, 'default.sqlite3')
+
+# Тесты очищают общий кэш и сразу ждут свежих данных.
+CACHES['local']['OPTIONS']['POLL_INTERVAL'] = 0
+
+# Превышение бюджета запросов роняет тест.
+QUERY_BUDGET_ENABLED = True
+QUERY_BUDGET_RAISE = True